@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Scores a whole line-list of new patients, e.g. a latestdata.csv shaped
+file, with the latest registered version of each model. The file is
+streamed chunksize rows at a time through a pipeline of three threads: one
+reads the next chunks, one encodes and scales them (with the vectorized
+cleaning stages, see Preprocessor.transform_batch) and scores them with
+every model, and one appends the predictions to the output csv. The threads
+pass chunks through queues of at most queue_size, so reading, scoring and
+writing overlap while only a few chunks are in memory, whatever the size of
+the input.
+
+    python -m src.batch_score build\\latestdata.csv build\\predictions.csv
+
+The output has the ID of every row (if the input has one), then for every
+model its score (the probability of death, or the SVM's decision function)
+and predicted outcome, as <model>_score and <model>_prediction, and an
+error column. Rows are written in the order they are read. A record which
+can not be encoded (e.g. an age range or symptom the cleaner does not
+know) is not scored: its scores are left empty and error says why. The
+output is written to a temporary file next to output_path, which is only
+renamed to it once every row is written.
+"""
+import argparse
+import os
+import queue
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from src.clean_covid_dataset import save_path, record_columns, raw_dtypes, feature_columns
+from src.preprocess import Preprocessor
+from src.registry import load_model, list_versions, common_bounds, model_names, registry_dir
+from src.scoring import model_outputs
+
+#Rows read, scored and written at once
+chunksize = 50000
+#Most chunks waiting between two threads of the pipeline
+queue_size = 2
+#Column identifying the rows, copied to the output if the input has it
+id_column = "ID"
+#Seconds between checks for a failed thread while waiting on a queue
+poll_interval = 0.1
+
+#Put on a queue after the last chunk
+end = object()
+#Got from a queue instead of an item once the pipeline is stopped
+stopped = object()
+
+def put(items, item, stop):
+    """
+    Puts item on a queue, unless stop is set first. Returns whether it was
+    put.
+    """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout = poll_interval)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def get(items, stop):
+    """
+    Gets the next item of a queue, or stopped if stop is set first.
+    """
+    while not stop.is_set():
+        try:
+            return items.get(timeout = poll_interval)
+        except queue.Empty:
+            pass
+    return stopped
+
+def read_chunks(path, chunks, stop, chunksize = chunksize):
+    """
+    Reads the records of a line-list onto chunks, one chunk of rows at a
+    time, followed by end. An error is put on chunks in place of end.
+    """
+    try:
+        titles = pd.read_csv(path, nrows = 0).columns
+        columns = [column for column in record_columns if column in titles]
+        dtypes = {column: raw_dtypes[column] for column in columns}
+        if id_column in titles:
+            columns.append(id_column)
+            dtypes[id_column] = str
+        with pd.read_csv(path, usecols = columns, dtype = dtypes, chunksize = chunksize) as reader:
+            for chunk in reader:
+                if not put(chunks, chunk, stop):
+                    return
+        put(chunks, end, stop)
+    except Exception as e:
+        put(chunks, e, stop)
+    return
+
+def write_chunks(path, results, stop, errors):
+    """
+    Appends every scored chunk on results to a temporary csv, and renames
+    it to path once end arrives. If the pipeline stops first, or writing
+    fails, the temporary file is deleted; an error is added to errors, and
+    stops the pipeline.
+    """
+    fd, staging = tempfile.mkstemp(dir = os.path.dirname(path) or ".", suffix = ".csv.tmp")
+    try:
+        with os.fdopen(fd, "w", newline = "", encoding = "utf-8") as f:
+            header = True
+            while True:
+                result = get(results, stop)
+                if result is end or result is stopped:
+                    break
+                result.to_csv(f, header = header, index = False)
+                f.flush()
+                header = False
+        if result is end:
+            os.replace(staging, path)
+            return
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    os.remove(staging)
+    return
+
+def encode_chunk(chunk, preprocessor):
+    """
+    Encodes and scales a chunk of records. The whole chunk is encoded at 
+    once if it can be; otherwise every record is encoded on its own (see
+    Preprocessor.transform_record), so only the invalid ones are left out.
+
+    Parameters
+    ----------
+    chunk : Pandas Dataframe
+        Records with (some of) the titles in record_columns.
+    preprocessor : Preprocessor
+        Preprocessing with the bounds the models were trained with.
+
+    Returns
+    -------
+    x : Numpy Array
+        Features of the records which could be encoded.
+    encoded : Numpy Array
+        Whether each record could be encoded.
+    messages : List of Strings
+        Why each record could not be encoded, empty if it could.
+
+    """
+    try:
+        return preprocessor.transform_batch(chunk), np.ones(len(chunk), dtype = bool), [""] * len(chunk)
+    except (ValueError, TypeError):
+        pass
+    rows = []
+    encoded = np.zeros(len(chunk), dtype = bool)
+    messages = [""] * len(chunk)
+    for i, record in enumerate(chunk.to_dict("records")):
+        try:
+            rows.append(preprocessor.transform_record(record))
+            encoded[i] = True
+        except (ValueError, TypeError) as e:
+            messages[i] = str(e)
+    if not rows:
+        return np.empty((0, len(feature_columns)), dtype = np.float32), encoded, messages
+    return np.stack(rows), encoded, messages
+
+def score_chunk(chunk, preprocessor, models):
+    """
+    Encodes, scales and scores a chunk of records with every model.
+
+    Parameters
+    ----------
+    chunk : Pandas Dataframe
+        Records with (some of) the titles in record_columns.
+    preprocessor : Preprocessor
+        Preprocessing with the bounds the models were trained with.
+    models : Dict
+        Models by name.
+
+    Returns
+    -------
+    result : Pandas Dataframe
+        ID, score and predicted outcome of every model, and error, for every
+        record. Records which could not be encoded have no scores.
+
+    """
+    x, encoded, messages = encode_chunk(chunk, preprocessor)
+    result = pd.DataFrame(index = chunk.index)
+    if id_column in chunk:
+        result[id_column] = chunk[id_column]
+    for name, model in models.items():
+        scores = np.full(len(chunk), np.nan)
+        y_pred = pd.array([pd.NA] * len(chunk), dtype = "Int64")
+        if len(x):
+            model_scores, model_pred = model_outputs(model, x)
+            scores[encoded] = model_scores
+            y_pred[encoded] = model_pred.astype(int)
+        result[name + "_score"] = scores
+        result[name + "_prediction"] = y_pred
+    result["error"] = messages
+    return result
+
+def score_file(path, output_path, names = model_names, chunksize = chunksize, queue_size = queue_size,
+               clean_path = save_path, registry = registry_dir):
+    """
+    Scores every record of a line-list and writes the predictions to a csv.
+
+    Parameters
+    ----------
+    path : String
+        Location of the line-list, with (some of) the titles in
+        record_columns.
+    output_path : String
+        Where to write the predictions.
+    names : List of Strings, optional
+        Models to score with. Those never registered are skipped.
+    chunksize : Int, optional
+        Rows read, scored and written at once.
+    queue_size : Int, optional
+        Most chunks waiting to be scored, and to be written.
+    clean_path : String, optional
+        Cleaned dataset whose saved bounds are used if no model has them.
+    registry : String, optional
+        Directory of the model registry.
+
+    Returns
+    -------
+    n_rows : Int
+        Number of records read.
+    n_failed : Int
+        Number of records which could not be encoded, so were not scored.
+
+    """
+    registered = [load_model(name, registry = registry) for name in names if list_versions(name, registry)]
+    if not registered:
+        raise FileNotFoundError("None of " + ", ".join(names) + " are saved in " + registry)
+    models = {model.name: model.model for model in registered}
+    preprocessor = Preprocessor(clean_path, bounds = common_bounds(registered))
+
+    chunks = queue.Queue(maxsize = queue_size)
+    results = queue.Queue(maxsize = queue_size)
+    stop = threading.Event()
+    errors = []
+    reader = threading.Thread(target = read_chunks, args = (path, chunks, stop, chunksize), daemon = True)
+    writer = threading.Thread(target = write_chunks, args = (output_path, results, stop, errors), daemon = True)
+    reader.start()
+    writer.start()
+    n_rows = 0
+    n_failed = 0
+    try:
+        while True:
+            chunk = get(chunks, stop)
+            if chunk is stopped:
+                break
+            if chunk is end:
+                put(results, end, stop)
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            result = score_chunk(chunk, preprocessor, models)
+            if not put(results, result, stop):
+                break
+            n_rows += len(chunk)
+            n_failed += int((result["error"] != "").sum())
+        writer.join()
+    finally:
+        #Also stops the reader and writer if scoring failed
+        stop.set()
+        reader.join()
+        writer.join()
+    if errors:
+        raise errors[0]
+    return n_rows, n_failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Score every record of a line-list with the registered models.")
+    parser.add_argument("input", help = "Line-list to score, e.g. build\\latestdata.csv.")
+    parser.add_argument("output", help = "Where to write the predictions, as csv.")
+    parser.add_argument("--models", nargs = "+", default = model_names, help = "Models to score with.")
+    parser.add_argument("--chunksize", type = int, default = chunksize, help = "Rows scored at once.")
+    parser.add_argument("--queue-size", type = int, default = queue_size,
+                        help = "Most chunks waiting between the reader, the models and the writer.")
+    args = parser.parse_args()
+    if args.chunksize < 1 or args.queue_size < 1:
+        parser.error("--chunksize and --queue-size must be at least 1")
+    n_rows, n_failed = score_file(args.input, args.output, args.models, args.chunksize, args.queue_size)
+    print("Scored " + str(n_rows - n_failed) + " of " + str(n_rows) + " records to " + args.output
+          + ", see its error column for the rest")
@@ -1,32 +1,396 @@
 # -*- coding: utf-8 -*-
 """
 To run code, need to specify two paths: the path variable, where the original data is located,
-and the save path, which specifies where to save the cleaned data.
+and the save path, which specifies where to save the cleaned data. Both can also be given on
+the command line, see main:
+    python -m src.clean_covid_dataset --input latestdata.csv --output build\cleandata.parquet
+Importing the module does not read any data.
 
 Citations:
 Numpy: Harris, C.R., Millman, K.J., van der Walt, S.J. et al. Array programming with NumPy. 
             Nature 585, 357–362 (2020). DOI: 0.1038/s41586-020-2649-2
 Pandas:  McKinney, Proceedings of the 9th Python in Science Conference, Volume 445, 2010.
 """
-import datetime
-import math
+import argparse
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
 import numpy as np
 import pandas as pd
 
 path = "latestdata.csv"
-save_path = "build\\cleandata.csv"
+save_path = "build\\cleandata.csv" #Or .parquet, .feather or .npy, see clean_formats
+cache_dir = "build\\clean_cache"
+cache_size = 3 #Runs kept in the cache, the least recently used are removed
+
+#Only these columns of the line-list are used, so only these are read in.
+#sex, outcome and admin1 are read as str, not category, as the stages write
+#values (encodings, -1 for missing) which are not among their categories
+raw_columns = ["age", "sex", "latitude", "longitude",
+               "date_onset_symptoms", "date_admission_hospital", 
+               "symptoms", "chronic_disease", "date_death_or_discharge", 
+               "outcome", "admin1"]
+raw_dtypes = {"age": str, "sex": str, "latitude": np.float32,
+              "longitude": np.float32, "date_onset_symptoms": str,
+              "date_admission_hospital": str, "symptoms": str,
+              "chronic_disease": str, "date_death_or_discharge": str,
+              "outcome": str, "admin1": str}
+#Date columns, converted together by Dataset.__convert_dates
+date_columns = ["date_death_or_discharge", "date_onset_symptoms", 
+                "date_admission_hospital"]
+#Columns of the cleaned dataset, in the order they are saved
+clean_columns = ["age", "sex_encoded", "latitude", "longitude",
+                 "date_onset_symptoms_days", "date_admission_hospital_days", 
+                 "outcome", "symptoms", 
+                 "diabetes", "hypertension", "Severe Underlying", 
+                 "Other Underlying"]
+#Columns the models are trained on, i.e. all cleaned columns but the outcome
+feature_columns = [column for column in clean_columns if column != "outcome"]
+#Ages given as a range (or a fraction of a year), and the age they are cleaned to
+age_ranges = {"50-59": "55", "38-68": "53", "80-89": "85", "40-49": "45",
+              "60-69": "65", "20-29": "25", "22-80": "51", "19-77": "48",
+              "70-79": "75", "21-72": "47", "90-99": "95", "15-88": "52",
+              "20-57": "39", "80-": "85", "0.75": "0", "0.5": "0",
+              "0.25": "0"}
+#Columns of the line-list the features are made from, see Dataset.encode_features
+record_columns = ["age", "sex", "latitude", "longitude",
+                  "date_onset_symptoms", "date_admission_hospital", 
+                  "symptoms", "chronic_disease"]
+#File types the cleaned dataset can be saved as, chosen by the save path
+clean_formats = [".csv", ".parquet", ".feather", ".npy"]
+
+#Symptom and chronic disease vocabularies, see load_vocabulary
+vocabulary_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabulary.json")
+
+def load_vocabulary(vocab_path):
+    """
+    Reads the symptom and chronic disease vocabularies from a versioned json
+    file into frozen lookup tables, so they can be extended without changing
+    the cleaning code.
+
+    Parameters
+    ----------
+    vocab_path : String
+        Location of the vocabulary json (see src/vocabulary.json).
+
+    Returns
+    -------
+    vocabulary : Mapping
+        Read-only lookup tables. Synonym and outlier tables map a name to
+        its replacement, symptom_tiers maps a symptom to its tier of 
+        severity (0-4), and the chronic disease categories are frozensets.
+
+    """
+    with open(vocab_path, encoding = "utf-8") as f:
+        raw = json.load(f)
+    symptoms = raw["symptoms"]
+    chronic = raw["chronic_disease"]
+    symptom_tiers = {name: tier for tier, names in enumerate(symptoms["tiers"]) 
+                     for name in names}
+    #Outliers replaced by null in the json are treated as missing
+    symptom_outliers = {entry: np.nan if replacement is None else replacement
+                        for entry, replacement in symptoms["outliers"].items()}
+    vocabulary = {"version": raw["version"],
+                  "symptom_synonyms": symptoms["synonyms"],
+                  "symptom_tiers": symptom_tiers,
+                  "symptom_outliers": symptom_outliers,
+                  "chronic_synonyms": chronic["synonyms"],
+                  "diabetes": frozenset(chronic["diabetes"]),
+                  "hypertension": frozenset(chronic["hypertension"]),
+                  "severe_underlying": frozenset(chronic["severe_underlying"]),
+                  "chronic_outliers": frozenset(chronic["outliers"])}
+    return freeze_vocabulary(vocabulary)
+
+def freeze_vocabulary(vocabulary):
+    """
+    Makes the tables of a vocabulary, and the vocabulary itself, read-only.
+    """
+    return MappingProxyType({name: MappingProxyType(dict(table)) 
+                             if isinstance(table, (dict, MappingProxyType)) else table
+                             for name, table in vocabulary.items()})
+
+default_vocabulary = load_vocabulary(vocabulary_path)
+
+def bounds_path(save_path):
+    """
+    Location of the normalization bounds saved alongside a cleaned dataset,
+    e.g. build\\cleandata_bounds.json for build\\cleandata.csv
+    """
+    return os.path.splitext(save_path)[0] + "_bounds.json"
+
+def save_bounds(path, bounds):
+    """
+    Saves the minimum and maximum of each cleaned column, so the same 
+    scaling can be reapplied at inference without the training data.
+
+    Parameters
+    ----------
+    path : String
+        Location of the json to write.
+    bounds : Tuple of Numpy Arrays
+        Minimum and maximum values, in the order of clean_columns.
+
+    Returns
+    -------
+    None.
+
+    """
+    min_val, max_val = bounds
+    with open(path, "w", encoding = "utf-8") as f:
+        json.dump({"columns": clean_columns, 
+                   "min": [float(x) for x in min_val],
+                   "max": [float(x) for x in max_val]}, f, indent = 4)
+    return
+
+def load_bounds(path):
+    """
+    Reads the bounds written by save_bounds.
+
+    Parameters
+    ----------
+    path : String
+        Location of the json.
+
+    Returns
+    -------
+    bounds : Tuple of Numpy Arrays
+        Minimum and maximum float32 values, in the order of clean_columns.
+
+    """
+    with open(path, encoding = "utf-8") as f:
+        raw = json.load(f)
+    if raw["columns"] != clean_columns:
+        raise ValueError("Bounds do not match the cleaned columns")
+    return np.array(raw["min"], dtype = np.float32), np.array(raw["max"], dtype = np.float32)
+
+def clean_format(path):
+    """
+    Finds the file type of a cleaned dataset from the extension of its path
+    (one of clean_formats).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in clean_formats:
+        raise ValueError("Cleaned data must be saved as .csv, .parquet, .feather or .npy")
+    return ext
+
+def labels_path(path):
+    """
+    Location of the outcome vector saved alongside a .npy feature matrix,
+    e.g. build\\cleandata_labels.npy for build\\cleandata.npy
+    """
+    return os.path.splitext(path)[0] + "_labels.npy"
+
+def save_clean_chunks(chunks, path, n_rows):
+    """
+    Writes cleaned chunks one after another to a single file, in the format
+    given by the extension of path. A .csv is appended to, .parquet and 
+    .feather are written a row group/record batch per chunk (with pyarrow),
+    and .npy writes a float32 feature matrix (feature_columns) to path and 
+    the outcome vector to labels_path(path), both memory-mappable.
+
+    Parameters
+    ----------
+    chunks : Iterable of Pandas Dataframes
+        Cleaned, normalized chunks with the columns of clean_columns.
+    path : String
+        Location to save to.
+    n_rows : Integer
+        Total number of rows over all chunks.
+
+    Returns
+    -------
+    None.
+
+    """
+    ext = clean_format(path)
+    if ext == ".csv":
+        header = True
+        for data_mc in chunks:
+            data_mc.to_csv(path, index = False, mode = "w" if header else "a", 
+                           header = header)
+            header = False
+    elif ext == ".npy":
+        features = np.lib.format.open_memmap(path, mode = "w+", dtype = np.float32,
+                                             shape = (n_rows, len(feature_columns)))
+        labels = np.lib.format.open_memmap(labels_path(path), mode = "w+", 
+                                           dtype = np.float32, shape = (n_rows,))
+        start = 0
+        for data_mc in chunks:
+            stop = start + len(data_mc)
+            features[start:stop] = data_mc.loc[:,feature_columns].values
+            labels[start:stop] = data_mc["outcome"].values
+            start = stop
+        features.flush()
+        labels.flush()
+        del features, labels
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for data_mc in chunks:
+            table = pa.Table.from_pandas(data_mc, preserve_index = False)
+            if writer is None:
+                if ext == ".parquet":
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    return
+
+def save_clean(data_mc, path):
+    """
+    Writes a cleaned dataset to path, see save_clean_chunks.
+    """
+    save_clean_chunks([data_mc], path, len(data_mc))
+    return
+
+def load_clean(path):
+    """
+    Reads a cleaned dataset saved by Dataset.clean_and_save, in any of
+    clean_formats. A .npy feature matrix is memory-mapped rather than read.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+
+    Returns
+    -------
+    data : Pandas Dataframe
+        Cleaned dataset, including the outcome column.
+
+    """
+    ext = clean_format(path)
+    if ext == ".csv":
+        return pd.read_csv(path)
+    elif ext == ".parquet":
+        return pd.read_parquet(path)
+    elif ext == ".feather":
+        return pd.read_feather(path)
+    data = pd.DataFrame(np.load(path, mmap_mode = "r"), columns = feature_columns)
+    data["outcome"] = np.load(labels_path(path), mmap_mode = "r")
+    return data
+
+def file_hash(path):
+    """
+    Sha256 hex digest of the contents of a file, read a block at a time.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def vocabulary_json(vocabulary):
+    """
+    Canonical json of a vocabulary from load_vocabulary, used for hashing.
+    """
+    tables = {}
+    for name, table in vocabulary.items():
+        if isinstance(table, frozenset):
+            table = sorted(table)
+        elif isinstance(table, MappingProxyType):
+            table = dict(table)
+        tables[name] = table
+    return json.dumps(tables, sort_keys = True)
+
+def saved_files(save_path):
+    """
+    Every file written by Dataset.clean_and_save for a save path.
+    """
+    files = [save_path, bounds_path(save_path)]
+    if clean_format(save_path) == ".npy":
+        files.append(labels_path(save_path))
+    return files
 
 class Dataset:
-    def __init__(self, path, save_path):
+    def __init__(self, path, save_path, chunksize = None, vocabulary = None, 
+                 cache_dir = None, checkpoint_dir = None, workers = None, cache_size = cache_size):
         self.path = path
+        #The extension of the save path decides the format, see clean_formats
+        clean_format(save_path)
         self.save_path = save_path
-        self.data = pd.read_csv(self.path, low_memory = False)
-        self.data_pc = self.data.loc[:,["age", "sex", "latitude", "longitude",
-                      "date_onset_symptoms", "date_admission_hospital", 
-                      "symptoms", "chronic_disease", "date_death_or_discharge", 
-                      "outcome", "admin1"]]
+        #Lookup tables from load_vocabulary, the bundled ones by default
+        if vocabulary is None:
+            vocabulary = default_vocabulary
+        self.vocabulary = vocabulary
+        #Minimum and maximum used by the last normalization
+        self.bounds = None
+        #If a chunksize is given, the line-list is streamed in clean_and_save
+        #instead of being read in whole here
+        self.chunksize = chunksize
+        #The line-list is only read in when data_pc is first used
+        self.__data_pc = None
+        #If a cache directory is given, clean_and_save reuses the output of
+        #an earlier run on the same file, vocabulary and code (see cache_key),
+        #keeping the cache_size most recently used runs
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        #If a checkpoint directory is given, the output of every stage is
+        #checkpointed there and reruns resume from it (see __run_stages)
+        self.checkpoint_dir = checkpoint_dir
+        #If a number of workers is given, the row-local stages are run on 
+        #that many partitions of the rows (of every chunk, if chunked) in
+        #parallel processes
+        self.workers = workers
+
+    @property
+    def data_pc(self):
+        """
+        The line-list at path, read in on first use.
+        """
+        if self.__data_pc is None:
+            self.__data_pc = self.__read_data(self.path)
+        return self.__data_pc
+    
+    @data_pc.setter
+    def data_pc(self, data_pc):
+        self.__data_pc = data_pc
+
+    def __getstate__(self):
+        """
+        Pickles the Dataset without its data, so it is cheap to send to the
+        worker processes. Read-only vocabulary tables cannot be pickled, so
+        they are sent as dicts and frozen again by __setstate__.
+        """
+        state = self.__dict__.copy()
+        state["_Dataset__data_pc"] = None
+        state["vocabulary"] = {name: dict(table) if isinstance(table, MappingProxyType) else table
+                               for name, table in self.vocabulary.items()}
+        return state
+    
+    def __setstate__(self, state):
+        state["vocabulary"] = freeze_vocabulary(state["vocabulary"])
+        self.__dict__.update(state)
+
+    def __read_data(self, path):
+        """
+        Reads only the columns used for cleaning from the line-list, with 
+        their dtypes pinned so pandas does not have to infer them
+
+        Parameters
+        ----------
+        path : String
+            Location of the original line-list csv.
+
+        Returns
+        -------
+        data_pc : Pandas Dataframe
+            Dataset with the relevant titles, in the order of columns.
+
+        """
+        data_pc = pd.read_csv(path, usecols = raw_columns, dtype = raw_dtypes)
+        return data_pc.loc[:,raw_columns]
 
-        
     def __remove_no_outcome(self, data_pc):
         """
         Remove data for which there was no listed outcome
@@ -50,18 +414,19 @@ class Dataset:
                               "date_death_or_discharge", "outcome", "admin1"]]
         return data_mc
 
-    def __convert_dates(self, data_mc, column):
+    def __convert_dates(self, data_mc, columns = date_columns):
         """
-        Converts a column in DD.MM.YYYY to days since January 1st, 2019.
-        Set up to convert date_death_or_discharge first, followed by date_onset
-        _symptoms followed by date_admission_hospital
+        Converts columns in DD.MM.YYYY to days since January 1st, 2019. All
+        the columns are parsed together in one pass, and each is replaced 
+        (in place) by a column of int16 days named column + "_days", with -1 
+        where the date is missing. The admin1 column is dropped.
 
         Parameters
         ----------
         data_mc : Pandas Dataframe
             Dataset with dates.
-        column : String
-            Title of column with dates (exclusively).
+        columns : List of Strings or String
+            Titles of columns with dates (exclusively), all three by default.
 
         Returns
         -------
@@ -69,44 +434,32 @@ class Dataset:
             Dataset with numerical dates.
 
         """
-        if column == "date_death_or_discharge":
-                data_mc.loc[data_mc['date_death_or_discharge'] == '03.22.2020',
-                            'date_death_or_discharge'] = "22.03.2020"
-        elif column == "date_onset_symptoms":
-            def typo_fixer(x): #Needed to fix a typo
-                try:
-                    if math.isnan(x) != True:
-                        if x[0] == "-":
-                            x = x[1:]
-                except:
-                    if len(x) >10:
-                        x = x[:10]
-                return x
-            data_mc.loc[:,"date_onset_symptoms"] = data_mc.loc[:,"date_onset_symptoms"].apply(typo_fixer) 
-        
-        data_mc.loc[:,column+"_d"] = pd.to_datetime(data_mc.loc[:,column], format = "%d.%m.%Y")
-        hold_data = data_mc.assign(hold_delta = lambda x: x.loc[:,column+"_d"]-datetime.datetime(2019, 1, 1))
-        #https://stackoverflow.com/questions/63294040/pandas-check-if-dataframe-has-negative-value-in-any-column
-        if (hold_data.loc[:,"hold_delta"].dt.days < 0).values.any():
+        if type(columns) == str:
+            columns = [columns]
+        dates = []
+        for column in columns:
+            date = data_mc[column].astype(object)
+            if column == "date_death_or_discharge":
+                date = date.replace("03.22.2020", "22.03.2020")
+            elif column == "date_onset_symptoms":
+                #Needed to fix typos: a leading "-" and ranges of dates
+                date = date.str.replace(r"^-", "", regex = True).str.slice(0, 10)
+            dates.append(date)
+        parsed = pd.to_datetime(pd.concat(dates, ignore_index = True), format = "%d.%m.%Y")
+        parsed = parsed.values.astype("datetime64[D]")
+        missing = np.isnat(parsed)
+        days = (parsed - np.datetime64("2019-01-01")).astype(np.int64)
+        if ((days < 0) & ~missing).any():
             raise ValueError("Date can not be from before 1st of January, 2019")
-        hold_data.loc[:,column+"_days"] = hold_data.loc[:,"hold_delta"].dt.days
-        if column == "date_death_or_discharge":
-            data_mc = hold_data.loc[:,["age", "sex", "latitude", "longitude",
-                                  "date_onset_symptoms", "date_admission_hospital", 
-                                  "symptoms", "chronic_disease", "date_death_or_discharge_days", 
-                                  "outcome"]]
-            
-        elif column == "date_onset_symptoms":
-            data_mc = hold_data.loc[:,["age", "sex", "latitude", "longitude",
-                      "date_onset_symptoms_days", "date_admission_hospital", 
-                      "symptoms", "chronic_disease", "date_death_or_discharge_days", 
-                      "outcome"]]
-            
-        elif column == "date_admission_hospital":
-            data_mc = hold_data.loc[:,["age", "sex", "latitude", "longitude",
-                      "date_onset_symptoms_days", "date_admission_hospital_days", 
-                      "symptoms", "chronic_disease", "date_death_or_discharge_days", 
-                      "outcome"]]
+        if ((days > np.iinfo(np.int16).max) & ~missing).any():
+            raise ValueError("Date can not be more than 32767 days after 1st of January, 2019")
+        days[missing] = -1
+        days = days.astype(np.int16).reshape(len(columns), len(data_mc))
+        
+        data_mc = data_mc.loc[:,[column for column in data_mc.columns if column != "admin1"]]
+        for i in range(len(columns)):
+            data_mc[columns[i]] = days[i]
+        data_mc = data_mc.rename(columns = {column: column + "_days" for column in columns})
         return data_mc
     
     def __sex_standardize(self,data_mc):
@@ -142,7 +495,9 @@ class Dataset:
     def __symptom_standardize(self,data_mc):
         """
         Converts the mixed categorical data into a numerical representation
-        of nominal categorical data. See report for details
+        of nominal categorical data. See report for details. Every entry is
+        split into its symptoms, which are mapped through the synonyms and
+        tiers of the vocabulary; the entry is encoded as its most severe tier.
 
         Parameters
         ----------
@@ -155,136 +510,43 @@ class Dataset:
             Dataset with numerically encoded symptom data.
 
         """
+        #One row per symptom, indexed by the position of its entry
+        sym_lists = data_mc["symptoms"].reset_index(drop = True).astype(object)
+        sym_lists = sym_lists.str.split(r"[,:;]")
+        has_symptoms = sym_lists.notna().values
+        sym = sym_lists[has_symptoms].explode().str.strip()
+        symptom_tiers = self.vocabulary["symptom_tiers"]
+        symptom_outliers = self.vocabulary["symptom_outliers"]
+        sym = sym.map(self.vocabulary["symptom_synonyms"]).fillna(sym)
+        tier = sym.map(symptom_tiers)
         
-        def symptoms_standardize(x):
-            """
-            Standardize so they can be encoded
-            """
-            if type(x) == str:
-                x.strip()
-                sym_hold = []
-                sym_list = x.split(",")
-                for i in range(len(sym_list)):
-                    holder = sym_list[i].split(":")
-                    for j in range(len(holder)):
-                        hold = holder[j].split(";")
-                        for k in range(len(hold)):
-                            sym_hold.append(hold[k])
-                sym_list = sym_hold.copy()
-                for i in range(len(sym_list)):
-                    sym_list[i] = sym_list[i].strip()
-                    if sym_list[i] == "transient fatigue" or sym_list[i] == "fatigure" or sym_list[i] == "somnolence":
-                        sym_list[i] = "fatigue"
-                    elif sym_list[i] == "dry cough":
-                        sym_list[i] = "cough"
-                    elif sym_list[i] == "sensation of chill" or sym_list[i] == "cold chills":
-                        sym_list[i] = "chills"
-                    elif sym_list[i] == "expectoration" or sym_list[i] == "little sputum":
-                        sym_list[i] = "sputum"
-                    elif sym_list[i] == "coronary artery stenting":
-                        sym_list[i] = "coronary heart disease"
-                    elif sym_list[i] == "frequent ventricular premature beat (FVPB)":
-                        sym_list[i] = "FVPB"
-                    elif sym_list[i] == "respiratory stress" or sym_list[i] == "gasp" or sym_list[i] == "shortness of breath" or sym_list[i] == "grasp":
-                        sym_list[i] = "dyspnea"
-                    elif sym_list[i] == "chest pain": #This one is a bit debatable
-                        sym_list[i] = "chest distress"
-                    elif sym_list[i] == "body malaise" or sym_list[i] == "malaise":
-                        sym_list[i] = 'discomfort'
-                    elif sym_list[i] == 'none' or sym_list[i] == 'afebrile':	
-                        sym_list[i] = 'asymptomatic'
-                    elif sym_list[i] == 'acute kidney injury':	
-                        sym_list[i] = 'acute renal failure'
-                    elif sym_list[i] == 'heart failure' or sym_list[i] == "cardiopulmonary arrest":	
-                        sym_list[i] = 'myocardial infarction'
-                    elif sym_list[i] == 'congestive heart failure' or sym_list[i] == "acute coronary syndrome":	
-                        sym_list[i] = 'myocardial infarction'
-                    elif sym_list[i] == "dyspnea" or sym_list[i] == "difficulty breathing" or sym_list[i] == "respiratory symptoms":
-                        sym_list[i] = "dsypnea"
-                    elif sym_list[i] == "acute respiratory distress" or sym_list[i] == "acute respiratory disease syndrome":
-                        sym_list[i] = "acute respiratory distress syndrome" 
-                    elif sym_list[i] == "myalgia" or sym_list[i] == "myalgias" or sym_list[i] == "mialgia":
-                        sym_list[i] = "muscular soreness"
-                    elif sym_list[i] == "kidney failure and hypertension":
-                        sym_list[i] = 'acute renal failure'
-                    elif sym_list[i] == "running nose":
-                        sym_list[i] = 'runny nose'
-                    elif sym_list[i] == "weak":
-                        sym_list[i] = "systemic weakness"
-                    elif sym_list[i] == "chest discomfort":
-                        sym_list[i] = "chest distress"
-                    elif sym_list[i] == "multiple electrolyte imbalance": #Not really what this means...
-                        sym_list[i] = "asymptomatic"
-                    elif sym_list[i] == "arrhythmia" or sym_list[i] == "cardiac arrhythmia" or sym_list[i] == "gastritis" or sym_list[i] == "significant clinical suspicion": #Will not be considered symptoms of Covid 19
-                        sym_list[i] = "asymptomatic"
-                        
-                new_x = ""
-                for i in range(len(sym_list)):
-                    if i == 0 and len(sym_list) == 1:
-                        new_x = str(sym_list[i])
-                    elif i == 0:
-                        new_x = str(sym_list[i]) + ","
-                    elif i != len(sym_list)-1:
-                        new_x = new_x + " " + str(sym_list[i]) + ","
-                    else:
-                        new_x = new_x + " " + str(sym_list[i])
-            else:
-                new_x = x
-            return new_x
-        
-        def sym_encode(x):
-            encode = [-1]*5
-            symptom = -1
-            if type(x) == str:
-                encode = [0]*5
-                sym_list = x.split(",")
-                for i in range(len(sym_list)):
-                    sym_list[i] = sym_list[i].strip()
-                    if sym_list[i] == 'acute respiratory failure' or sym_list[i] == 'acute respiratory distress syndrome' or sym_list[i] == 'acute renal failure' or sym_list[i] == 'multiple organ failure' or sym_list[i] == 'myocardial infarction' or sym_list[i] == 'heart failure' or sym_list[i] == 'myocardial dysfunction' or sym_list[i] == 'septic shock' or sym_list[i] == 'acute myocardial infarction' or sym_list[i] == 'cardiogenic shock':
-                        encode[4] = 1
-                    elif sym_list[i] == 'severe pneumonia' or sym_list[i] == 'acute respiratory disease' or sym_list[i] == '' or sym_list[i] == 'hypoxia' or sym_list[i] == 'lesions on chest radiographs' or sym_list[i] == 'Severe' or sym_list[i] == 'severe acute respiratory infection' or sym_list[i] == "severe":
-                        encode[3] = 1
-                    elif sym_list[i] == 'pneumonia' or sym_list[i] == 'sepsis' or sym_list[i] == 'dsypnea' or sym_list[i] == 'dyspnea' or sym_list[i] == 'chest distress':
-                        encode[2] = 1
-                    elif sym_list[i] == 'fever' or sym_list[i] == 'cough' or sym_list[i] == 'sore throat' or sym_list[i] == 'discomfort' or sym_list[i] == 'dizziness' or sym_list[i] == 'diarrhea' or sym_list[i] == 'headache' or sym_list[i] == 'emesis' or sym_list[i] == 'runny nose' or sym_list[i] == 'fatigue' or sym_list[i] == 'systemic weakness' or sym_list[i] == 'chills' or sym_list[i] == "colds" or sym_list[i] == "sputum" or sym_list[i] == "muscular soreness":
-                        encode[1] = 1
-                    elif sym_list[i] == "asymptomatic":
-                        encode[0] = 1
-                    elif sym_list[i] == "Mild to moderate":
-                        encode[2] = 1
-                        encode[1] = 1
-                    else:
-                        raise ValueError("Not a valid symptom")
-            if encode[4] == 1:
-                symptom = 4
-            elif encode[3] == 1:
-                symptom = 3
-            elif encode[2] == 1:
-                symptom = 2
-            elif encode[1] == 1:
-                symptom = 1
-            elif encode[0] == 1:
-                symptom = 0   
-            return symptom
+        #Entries with unknown symptoms are either outliers or invalid
+        unknown = tier.isna()
+        if unknown.any():
+            unknown_rows = sym.index[unknown].unique()
+            joined = sym.loc[unknown_rows].groupby(level = 0).agg(", ".join)
+            for row, entry in joined.items():
+                if entry not in symptom_outliers:
+                    raise ValueError("Not a valid symptom")
+                replacement = symptom_outliers[entry]
+                if type(replacement) == str:
+                    tier.loc[row] = max(symptom_tiers[x.strip()] for x in replacement.split(","))
+                else:
+                    tier.loc[row] = np.nan
         
-        #Encode Symptoms
-        data_mc.loc[:,"symptoms"] = data_mc.loc[:,"symptoms"].apply(symptoms_standardize) 
-        #Remove outlier symptoms
-        data_mc.loc[data_mc['symptoms'] == 'torpid evolution with respiratory distress and severe bronchopneumonia','symptoms'] = "acute respiratory disease, pneumonia"
-        data_mc.loc[data_mc['symptoms'] == 'obnubilation','symptoms'] = np.nan
-        data_mc.loc[data_mc['symptoms'] == 'primary myelofibrosis','symptoms'] = np.nan
-        data_mc.loc[data_mc['symptoms'] == 'chills, conjunctivitis, cough, fever','symptoms'] = "chills, cough, fever"     
-        data_mc.loc[data_mc['symptoms'] == 'anorexia, fatigue','symptoms'] = "fatigue"
-        data_mc.loc[data_mc['symptoms'] == 'eye irritation, fever','symptoms'] = "fever"
-        data_mc.loc[data_mc['symptoms'] == 'obnubilation, fatigue','symptoms'] = "fatigue"
-        data_mc.loc[data_mc['symptoms'] == 'cough, colds, dysphagia','symptoms'] = "cough, colds"
-        data_mc.loc[:,"symptoms"] = data_mc.loc[:,"symptoms"].apply(sym_encode) 
+        symptoms = np.full(len(sym_lists), -1, dtype = np.int64)
+        tier = tier.groupby(level = 0).max().dropna()
+        symptoms[tier.index.values] = tier.values
+        data_mc["symptoms"] = symptoms
         return data_mc
     
     def __chronic_disease_standardize(self, data_mc):
         """
         Converts the mixed categorical data into 4 numerical representation
-        of binary categorical data. See report for details
+        of binary categorical data. See report for details. Every entry is 
+        split into its diseases, which are mapped through the synonyms of the
+        vocabulary and looked up in its diabetes, hypertension and severe
+        underlying categories; anything else is an other underlying disease.
 
         Parameters
         ----------
@@ -295,82 +557,32 @@ class Dataset:
         -------
         data_mc : Pandas Dataframe
             Dataset with numerically encoded chronic disease data, split into
-            4 columns ("diabetes", "hypertension", "Severe Underlying", 
-                       "Other Underlying")
+            4 int8 columns ("diabetes", "hypertension", "Severe Underlying", 
+                            "Other Underlying"), -1 where missing
 
         """
-        def chronic_disease_standardize(x):        
-            if type(x) == str:
-                x.strip()
-                sym_hold = []
-                sym_list = x.split(",")
-                for i in range(len(sym_list)):
-                    holder = sym_list[i].split(":")
-                    for i in range(len(holder)):
-                        sym_hold.append(holder[i])
-                sym_list = sym_hold.copy()
-                for i in range(len(sym_list)):
-                    sym_list[i] = sym_list[i].strip()
-                    if sym_list[i] == "hypertension for more than 20 years":
-                        sym_list[i] = "hypertension"
-                    elif sym_list[i] == "chronic obstructive pulmonary disease":
-                        sym_list[i] = "COPD"
-                    elif sym_list[i] == "diabetes for more than 20 years":
-                        sym_list[i] = "diabetes"
-                    elif sym_list[i] == "coronary stenting":
-                        sym_list[i] = "coronary heart disease"
-                    elif sym_list[i] == "coronary artery stenting":
-                        sym_list[i] = "coronary heart disease"
-                    elif sym_list[i] == "frequent ventricular premature beat (FVPB)":
-                        sym_list[i] = "FVPB"
-                    elif sym_list[i] == "Parkinson's disease for five years":
-                        sym_list[i] = "Parkinson's disease"
-                    elif sym_list[i] == "stenocardia": #This one is a bit debatable
-                        sym_list[i] = "coronary heart disease"
-                    elif sym_list[i] == "coronary artery stenting":
-                        sym_list[i] = "coronary heart disease"
-                    elif sym_list[i] == "coronary artery stenting":
-                        sym_list[i] = "coronary heart disease"                
-                new_x = ""
-                for i in range(len(sym_list)):
-                    if i == 0 and len(sym_list) == 1:
-                        new_x = str(sym_list[i])
-                    elif i == 0:
-                        new_x = str(sym_list[i]) + ","
-                    elif i != len(sym_list)-1:
-                        new_x = new_x + " "+str(sym_list[i]) + ","
-                    else:
-                        new_x = new_x + " " + str(sym_list[i])
-            else:
-                new_x = x
-            return new_x
+        chronic = data_mc["chronic_disease"].reset_index(drop = True).astype(object)
+        chronic = chronic.mask(chronic.isin(self.vocabulary["chronic_outliers"]))
+        #One row per disease, indexed by the position of its entry
+        dis_lists = chronic.str.split(r"[,:]")
+        has_disease = dis_lists.notna().values
+        dis = dis_lists[has_disease].explode().str.strip()
+        dis = dis.map(self.vocabulary["chronic_synonyms"]).fillna(dis)
         
-        def chronic_encode(x):
-            encode = [-1]*4
-            if type(x) == str:
-                encode = [0]*4
-                sym_list = x.split(",")
-                for i in range(len(sym_list)):
-                    sym_list[i] = sym_list[i].strip()
-                    if sym_list[i] == 'diabetes':
-                        encode[3] = 1
-                    if sym_list[i] == 'hypertension':
-                        encode[2] = 1
-                    if sym_list[i] == 'COPD' or sym_list[i] == 'chronic bronchitis' or sym_list[i] == 'Tuberculosis' or sym_list[i] == 'chronic renal insufficiency' or sym_list[i] == 'coronary heart disease' or sym_list[i] == 'colon cancer surgery' or sym_list[i] == 'lung cancer' or sym_list[i] == 'HIV positive' or sym_list[i] == 'prostate hypertrophy' or sym_list[i] == 'Chronic pulmonary condition' or sym_list[i] == 'Pre-renal azotemia' or sym_list[i] == 'asthma' or sym_list[i] == 'valvular heart disease' or sym_list[i] == 'ischemic heart disease' or sym_list[i] == 'benign prostatic hyperplasia' or sym_list[i] == 'dislipidemia' or sym_list[i] == 'atherosclerosis' or sym_list[i] == 'cardiac disease' or sym_list[i] == 'prostate cancer':
-                        encode[1] = 1
-                    if sym_list[i] == 'COPD' or sym_list[i] == 'chronic bronchitis' or sym_list[i] == 'Tuberculosis' or sym_list[i] == 'chronic renal insufficiency' or sym_list[i] == 'coronary heart disease' or sym_list[i] == 'colon cancer surgery' or sym_list[i] == 'lung cancer' or sym_list[i] == 'HIV positive' or sym_list[i] == 'prostate hypertrophy' or sym_list[i] == 'Chronic pulmonary condition' or sym_list[i] == 'Pre-renal azotemia' or sym_list[i] == 'asthma' or sym_list[i] == 'valvular heart disease' or sym_list[i] == 'ischemic heart disease' or sym_list[i] == 'benign prostatic hyperplasia' or sym_list[i] == 'dislipidemia' or sym_list[i] == 'atherosclerosis' or sym_list[i] == 'cardiac disease' or sym_list[i] == 'prostate cancer' or sym_list[i] == 'diabetes' or sym_list[i] == 'hypertension':
-                        empty = 0
-                    else:
-                        encode[0] = 1
-            return encode
+        diabetes = self.vocabulary["diabetes"]
+        hypertension = self.vocabulary["hypertension"]
+        severe_underlying = self.vocabulary["severe_underlying"]
+        flags = pd.DataFrame({"Other Underlying": ~dis.isin(diabetes | hypertension | severe_underlying),
+                              "Severe Underlying": dis.isin(severe_underlying),
+                              "hypertension": dis.isin(hypertension),
+                              "diabetes": dis.isin(diabetes)})
+        flags = flags.groupby(level = 0).max()
         
         #Encode Chronic Disease
-        data_mc.loc[data_mc['chronic_disease'] == 'Iran; Kuala Lumpur, Federal Territory of Kuala Lumpur, Malaysia','chronic_disease'] = np.nan
-        data_mc.loc[:,"chronic_disease"] = data_mc.loc[:,"chronic_disease"].apply(chronic_disease_standardize) 
-        data_mc.loc[:,"chronic_disease"] = data_mc.loc[:,"chronic_disease"].apply(chronic_encode) 
-        holder = data_mc.chronic_disease.apply(pd.Series)
-        holder.columns = ["Other Underlying","Severe Underlying","hypertension","diabetes"]
-        data_mc = pd.concat([data_mc, holder], axis=1, join="inner")
+        for column in flags.columns:
+            encoded = np.full(len(chronic), -1, dtype = np.int8)
+            encoded[flags.index.values] = flags[column].values
+            data_mc[column] = encoded
         return data_mc
     
     def __outcome_standardize(self, data_mc):
@@ -468,78 +680,510 @@ class Dataset:
 
         """
         #Clean Rest of the Data
-        data_mc.loc[data_mc['age'] == '50-59','age'] = "55"
-        data_mc.loc[data_mc['age'] == '38-68','age'] = "53"
-        data_mc.loc[data_mc['age'] == '80-89','age'] = "85"
-        data_mc.loc[data_mc['age'] == '40-49','age'] = "45"
-        data_mc.loc[data_mc['age'] == '60-69','age'] = "65"
-        data_mc.loc[data_mc['age'] == '20-29','age'] = "25"
-        data_mc.loc[data_mc['age'] == '22-80','age'] = "51"
-        data_mc.loc[data_mc['age'] == '19-77','age'] = "48"
-        data_mc.loc[data_mc['age'] == '70-79','age'] = "75"
-        data_mc.loc[data_mc['age'] == '21-72','age'] = "47"
-        data_mc.loc[data_mc['age'] == '90-99','age'] = "95"
-        data_mc.loc[data_mc['age'] == '15-88','age'] = "52"
-        data_mc.loc[data_mc['age'] == '20-57','age'] = "39"
-        data_mc.loc[data_mc['age'] == '80-','age'] = "85"
-        data_mc.loc[data_mc['age'] == '0.75','age'] = "0"
-        data_mc.loc[data_mc['age'] == '0.5','age'] = "0"
-        data_mc.loc[data_mc['age'] == '0.25','age'] = "0"
+        data_mc['age'] = data_mc['age'].replace(age_ranges)
+        return data_mc
+    
+    def __fill_missing(self, data_mc):
+        """
+        Fills all empty entries with -1 and converts age to a numerical
+        integer, ready for normalization
+
+        Parameters
+        ----------
+        data_mc : Pandas Dataframe
+            Dataset with empty entries.
+        Returns
+        -------
+        data_mc : Pandas Dataframe
+            Dataset without empty entries.
+
+        """
+        data_mc.fillna(value = -1, axis = 1, inplace = True)
+        data_mc['age'] = data_mc['age'].astype(int)
         return data_mc
     
-    def __normalize(self, data_mc):
+    def __to_block(self, data_mc, columns = clean_columns):
+        """
+        Copies the cleaned columns into a single float32 array
+
+        Parameters
+        ----------
+        data_mc : Pandas Dataframe
+            Dataset with filled, unnormalized values.
+        columns : List of Strings
+            Titles of the columns to copy, all of clean_columns by default.
+        Returns
+        -------
+        block : Numpy Array
+            Values with one column per entry of columns.
+
+        """
+        block = np.empty((len(data_mc), len(columns)), dtype = np.float32)
+        for i in range(len(columns)):
+            values = np.asarray(data_mc[columns[i]])
+            if values.dtype == object and pd.api.types.infer_dtype(values, skipna = False) not in (
+                    "integer", "floating", "mixed-integer-float"):
+                raise TypeError("All columns must be numerical to normalize")
+            block[:,i] = values
+        return block
+    
+    def __bounds(self, data_mc):
+        """
+        Finds the minimum and maximum of each of the cleaned columns
+
+        Parameters
+        ----------
+        data_mc : Pandas Dataframe
+            Dataset with filled, unnormalized values.
+        Returns
+        -------
+        bounds : Tuple of Numpy Arrays
+            Minimum and maximum values, in the order of clean_columns.
+
+        """
+        block = self.__to_block(data_mc)
+        return block.min(axis = 0), block.max(axis = 0)
+    
+    def __normalize(self, data_mc, bounds = None):
         """
         Normalizes data. Fills all empty entries with -1, before normalizing
-        all values in range between 0 and 1.
+        all values in range between 0 and 1. The columns are scaled together
+        as one float32 block, in place.
 
         Parameters
         ----------
         data_mc : Pandas Dataframe
             Dataset with unnormalized values.
+        bounds : Tuple of Numpy Arrays, optional
+            Minimum and maximum of each column (see __bounds). If not given,
+            they are taken from data_mc itself.
         Returns
         -------
         data_mc : Pandas Dataframe
             Dataset with normalized numerical values.
 
         """
-        columns = ["age", "sex_encoded", "latitude", "longitude",
-                      "date_onset_symptoms_days", "date_admission_hospital_days", 
-                      "outcome", "symptoms", 
-                      "diabetes", "hypertension", "Severe Underlying", 
-                      "Other Underlying"]
-        #Fill empty entries, and convert age to numerical integer
-        data_mc.fillna(value = -1, axis = 1, inplace = True)
-        data_mc['age'] = data_mc['age'].astype(int)
+        data_mc = self.__fill_missing(data_mc)
+        block = self.__to_block(data_mc)
+        if bounds is None:
+            bounds = (block.min(axis = 0), block.max(axis = 0))
+        min_val, max_val = bounds
         #Normalize Across Datasets
-        def normalize(column):
-            all_val = data_mc[column]
-            try:
-                min_val = np.min(all_val)
-                max_val = np.max(all_val)
-            except:
-                raise TypeError("All columns must be numerical to normalize")
-            def __norm(x):
-                return(x - min_val)/(max_val-min_val)
-            data_mc.loc[:,column] = data_mc.loc[:,column].apply(__norm)
-            return
-        
-        for i in range(len(columns)):
-            normalize(columns[i])
-        return data_mc
+        block -= min_val
+        block /= (max_val - min_val)
+        self.bounds = bounds
+        return pd.DataFrame(block, columns = clean_columns, index = data_mc.index)
     
-    def clean_and_save(self):
-        data_mc = self.__remove_no_outcome(self.data_pc)
-        data_mc = self.__convert_dates(data_mc, "date_death_or_discharge")
-        data_mc = self.__convert_dates(data_mc, "date_onset_symptoms")
-        data_mc = self.__convert_dates(data_mc, "date_admission_hospital")
+    def encode_features(self, data_pc):
+        """
+        Encodes records without an outcome, e.g. new patients to score, 
+        with the same date, sex, symptom, chronic disease and age stages as
+        the cleaning pipeline, but without dropping any rows or normalizing.
+
+        Parameters
+        ----------
+        data_pc : Pandas Dataframe
+            Records with (some of) the titles in record_columns, missing 
+            titles are taken as empty.
+        Returns
+        -------
+        block : Numpy Array
+            Unnormalized float32 values, one row per record and one column 
+            per entry of feature_columns, -1 where missing.
+
+        """
+        data_mc = data_pc.reindex(columns = record_columns)
+        data_mc = self.__convert_dates(data_mc, ["date_onset_symptoms", "date_admission_hospital"])
         data_mc = self.__sex_standardize(data_mc)
         data_mc = self.__symptom_standardize(data_mc)
         data_mc = self.__chronic_disease_standardize(data_mc)
-        data_mc = self.__outcome_standardize(data_mc)
         data_mc = self.__age_cleaner(data_mc)
-        data_mc = self.__normalize(data_mc)
-        data_mc.to_csv(self.save_path, index=False)
+        data_mc = self.__fill_missing(data_mc)
+        return self.__to_block(data_mc, feature_columns)
+    
+    #The cleaning pipeline, in order. Every stage takes and returns the 
+    #dataset, and all but the last only look at one row at a time
+    stages = [("remove_no_outcome", __remove_no_outcome),
+              ("convert_dates", __convert_dates),
+              ("sex_standardize", __sex_standardize),
+              ("symptom_standardize", __symptom_standardize),
+              ("chronic_disease_standardize", __chronic_disease_standardize),
+              ("outcome_standardize", __outcome_standardize),
+              ("age_cleaner", __age_cleaner),
+              ("normalize", __normalize)]
+    #Stages whose output depends on the vocabulary
+    vocabulary_stages = ["symptom_standardize", "chronic_disease_standardize"]
+    
+    def __clean_rows(self, data_pc, start = 0, stop = -1):
+        """
+        Runs the cleaning stages which only look at one row at a time, i.e.
+        all of them except the normalization, or stages[start:stop] of them
+
+        Parameters
+        ----------
+        data_pc : Pandas Dataframe
+            Dataset with the relevant titles.
+        start : Int, optional
+            First stage to run.
+        stop : Int, optional
+            Stage to stop before, the normalization by default.
+        Returns
+        -------
+        data_mc : Pandas Dataframe
+            Dataset with numerical, unnormalized values.
+
+        """
+        data_mc = data_pc
+        for name, stage in self.stages[start:stop]:
+            data_mc = stage(self, data_mc)
         return data_mc
+    
+    def __clean_rows_parallel(self, data_pc, executor, start = 0, stop = -1):
+        """
+        Runs __clean_rows on as many contiguous partitions of the rows as 
+        there are workers, each in a process of executor, and concatenates
+        the results in order. As the stages are row-local, this gives the 
+        same dataset as __clean_rows.
+
+        Parameters
+        ----------
+        data_pc : Pandas Dataframe
+            Dataset with the relevant titles.
+        executor : ProcessPoolExecutor
+            Pool of the worker processes, see __pool.
+        start : Int, optional
+            First stage to run.
+        stop : Int, optional
+            Stage to stop before, the normalization by default.
+        Returns
+        -------
+        data_mc : Pandas Dataframe
+            Dataset with numerical, unnormalized values.
+
+        """
+        if executor is None:
+            return self.__clean_rows(data_pc, start, stop)
+        edges = np.linspace(0, len(data_pc), self.workers + 1).astype(int)
+        partitions = [data_pc.iloc[edges[i]:edges[i + 1]] for i in range(self.workers)]
+        cleaned = list(executor.map(self.clean_partition, partitions, 
+                                    [start] * self.workers, [stop] * self.workers))
+        return pd.concat(cleaned)
+    
+    def __pool(self):
+        """
+        Pool of the worker processes, shared by every chunk or stage of a
+        run, or a context giving None to clean in this process.
+        """
+        if self.workers is None:
+            return contextlib.nullcontext()
+        return ProcessPoolExecutor(max_workers = self.workers)
+    
+    def clean_partition(self, data_pc, start = 0, stop = -1):
+        """
+        Public entry point to __clean_rows for the worker processes, as a
+        name-mangled method cannot be looked up again after pickling.
+        """
+        return self.__clean_rows(data_pc, start, stop)
+    
+    def stage_keys(self):
+        """
+        Hash identifying the output of each stage. A stage's key covers the
+        key before it, its source code and, for vocabulary_stages, the
+        vocabulary, starting from the contents of the line-list at path and
+        what every stage shares (see shared_key). So editing a stage only 
+        invalidates it and the stages after it, while editing a shared 
+        helper or table invalidates them all.
+
+        Returns
+        -------
+        keys : List of Strings
+            Hex digest for each of stages.
+
+        """
+        keys = []
+        key = hashlib.sha256((file_hash(self.path) + self.shared_key()).encode("utf-8")).hexdigest()
+        for name, stage in self.stages:
+            digest = hashlib.sha256((key + name).encode("utf-8"))
+            digest.update(inspect.getsource(stage).encode("utf-8"))
+            if name in self.vocabulary_stages:
+                digest.update(vocabulary_json(self.vocabulary).encode("utf-8"))
+            key = digest.hexdigest()
+            keys.append(key)
+        return keys
+    
+    def shared_key(self):
+        """
+        Hash of what the stages use besides their own source: the reading of
+        the line-list, the helpers of the normalization, and the module 
+        tables of columns, dtypes and age ranges.
+
+        Returns
+        -------
+        key : String
+            Hex digest of the shared helpers and tables.
+
+        """
+        key = hashlib.sha256()
+        for helper in [self.__read_data, self.__fill_missing, self.__to_block, self.__bounds]:
+            key.update(inspect.getsource(helper).encode("utf-8"))
+        tables = [raw_columns, {column: str(dtype) for column, dtype in raw_dtypes.items()},
+                  date_columns, clean_columns, age_ranges]
+        key.update(json.dumps(tables, sort_keys = True).encode("utf-8"))
+        return key.hexdigest()
+    
+    def __checkpoint_path(self, i, key):
+        """
+        Location of the checkpoint of the i-th stage with a given key.
+        """
+        prefix = str(i) + "_" + self.stages[i][0] + "_"
+        return os.path.join(self.checkpoint_dir, prefix + key[:20] + ".pkl")
+    
+    def __save_checkpoint(self, i, key, data_mc):
+        """
+        Pickles the output of the i-th stage (and the bounds, which the 
+        normalization sets), replacing any older checkpoint of that stage.
+        """
+        path = self.__checkpoint_path(i, key)
+        prefix = str(i) + "_" + self.stages[i][0] + "_"
+        for file in os.listdir(self.checkpoint_dir):
+            if file.startswith(prefix):
+                os.remove(os.path.join(self.checkpoint_dir, file))
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump((data_mc, self.bounds), f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        return
+    
+    def __run_stages(self):
+        """
+        Runs the whole pipeline on data_pc. If the Dataset was made with a
+        checkpoint directory, the output of every stage is checkpointed, and
+        the run resumes after the last stage with a valid checkpoint (see
+        stage_keys), without reading data_pc if there is one.
+
+        Returns
+        -------
+        data_mc : Pandas Dataframe
+            Cleaned, normalized dataset.
+
+        """
+        if self.checkpoint_dir is None:
+            with self.__pool() as executor:
+                data_mc = self.__clean_rows_parallel(self.data_pc, executor)
+            return self.__normalize(data_mc)
+        os.makedirs(self.checkpoint_dir, exist_ok = True)
+        keys = self.stage_keys()
+        start = 0
+        for i in reversed(range(len(self.stages))):
+            path = self.__checkpoint_path(i, keys[i])
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    data_mc, self.bounds = pickle.load(f)
+                start = i + 1
+                break
+        if start == 0:
+            data_mc = self.data_pc
+        with self.__pool() as executor:
+            #The row-local stages run on the workers, the normalization here
+            for i in range(start, len(self.stages) - 1):
+                data_mc = self.__clean_rows_parallel(data_mc, executor, i, i + 1)
+                self.__save_checkpoint(i, keys[i], data_mc)
+        if start < len(self.stages):
+            i = len(self.stages) - 1
+            data_mc = self.stages[i][1](self, data_mc)
+            self.__save_checkpoint(i, keys[i], data_mc)
+        return data_mc
+    
+    def __clean_and_save_chunked(self):
+        """
+        Cleans the line-list chunksize rows at a time. The first pass cleans
+        every chunk (on the workers, if any), spills it to a temporary directory and keeps a running 
+        minimum and maximum of each column. The second pass normalizes the 
+        spilled chunks with the global bounds and appends them to the save
+        path (see save_clean_chunks), so only one chunk is held in memory at
+        once.
+
+        Returns
+        -------
+        None.
+
+        """
+        min_val = None
+        max_val = None
+        n_rows = 0
+        with tempfile.TemporaryDirectory() as spill_dir, self.__pool() as executor:
+            spilled = []
+            reader = pd.read_csv(self.path, usecols = raw_columns, 
+                                 dtype = raw_dtypes, chunksize = self.chunksize)
+            for chunk in reader:
+                if not chunk["outcome"].notna().any():
+                    continue
+                data_mc = self.__clean_rows_parallel(chunk, executor)
+                if len(data_mc) == 0:
+                    continue
+                data_mc = self.__fill_missing(data_mc)
+                chunk_min, chunk_max = self.__bounds(data_mc)
+                if min_val is None:
+                    min_val, max_val = chunk_min, chunk_max
+                else:
+                    min_val = np.minimum(min_val, chunk_min)
+                    max_val = np.maximum(max_val, chunk_max)
+                spill_path = os.path.join(spill_dir, str(len(spilled)) + ".pkl")
+                data_mc.to_pickle(spill_path)
+                spilled.append(spill_path)
+                n_rows += len(data_mc)
+            
+            def normalized_chunks():
+                for spill_path in spilled:
+                    data_mc = pd.read_pickle(spill_path)
+                    yield self.__normalize(data_mc, (min_val, max_val))
+            save_clean_chunks(normalized_chunks(), self.save_path, n_rows)
+        if min_val is not None:
+            save_bounds(bounds_path(self.save_path), (min_val, max_val))
+        elif os.path.isfile(bounds_path(self.save_path)):
+            #Left by an earlier run, so does not describe this output
+            os.remove(bounds_path(self.save_path))
+        return
+    
+    def cache_key(self):
+        """
+        Hash identifying a cleaning run. It covers the contents of the 
+        line-list at path, the vocabulary, the source of this module and the
+        save format, so changing any of them invalidates the cache.
+
+        Returns
+        -------
+        key : String
+            Hex digest of the run.
+
+        """
+        key = hashlib.sha256(file_hash(self.path).encode("utf-8"))
+        key.update(vocabulary_json(self.vocabulary).encode("utf-8"))
+        with open(os.path.abspath(__file__), "rb") as f:
+            key.update(f.read())
+        key.update(clean_format(self.save_path).encode("utf-8"))
+        return key.hexdigest()
+    
+    def __load_cached(self, key):
+        """
+        Copies the output of a cached run to the save path, if there is one.
+
+        Returns
+        -------
+        hit : Boolean
+            Whether the run was in the cache.
+
+        """
+        entry = os.path.join(self.cache_dir, key)
+        targets = saved_files(self.save_path)
+        cached = [os.path.join(entry, str(i)) for i in range(len(targets))]
+        if not all(os.path.isfile(file) for file in cached):
+            return False
+        for file, target in zip(cached, targets):
+            shutil.copyfile(file, target)
+        #Marks the entry as recently used, see __prune_cached
+        os.utime(entry)
+        self.bounds = load_bounds(bounds_path(self.save_path))
+        return True
+    
+    def __store_cached(self, key):
+        """
+        Copies the output of this run into the cache, as a new entry, and
+        removes the least recently used entries beyond cache_size.
+        """
+        os.makedirs(self.cache_dir, exist_ok = True)
+        entry = os.path.join(self.cache_dir, key)
+        staging = tempfile.mkdtemp(dir = self.cache_dir)
+        for i, file in enumerate(saved_files(self.save_path)):
+            shutil.copyfile(file, os.path.join(staging, str(i)))
+        if os.path.isdir(entry):
+            shutil.rmtree(staging)
+        else:
+            os.rename(staging, entry)
+        self.__prune_cached()
+        return
+    
+    def __prune_cached(self):
+        """
+        Removes all but the cache_size most recently stored or loaded
+        entries of the cache.
+        """
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if len(name) == 64 and os.path.isdir(os.path.join(self.cache_dir, name))]
+        entries.sort(key = os.path.getmtime, reverse = True)
+        for entry in entries[self.cache_size:]:
+            shutil.rmtree(entry, ignore_errors = True)
+        return
+    
+    def clean_and_save(self):
+        """
+        Cleans the dataset and saves it to the save path, with the minimum
+        and maximum used to normalize it next to it (see bounds_path). If the
+        Dataset was made with a chunksize, the line-list is streamed through
+        in chunks instead and nothing is returned. If it was made with a 
+        cache directory and the same run is cached, the cached output is 
+        copied to the save path instead of cleaning again.
+
+        Returns
+        -------
+        data_mc : Pandas Dataframe
+            Cleaned dataset (read back from the save path on a cache hit), 
+            or None when chunked.
+
+        """
+        if self.cache_dir is not None:
+            key = self.cache_key()
+            if self.__load_cached(key):
+                if self.chunksize is not None:
+                    return
+                return load_clean(self.save_path)
+        if self.chunksize is not None:
+            self.__clean_and_save_chunked()
+            data_mc = None
+        else:
+            data_mc = self.__run_stages()
+            save_clean(data_mc, self.save_path)
+            save_bounds(bounds_path(self.save_path), self.bounds)
+        #Nothing is cached if there were no rows with an outcome, so no bounds
+        if self.cache_dir is not None and all(os.path.isfile(file) for file in saved_files(self.save_path)):
+            self.__store_cached(key)
+        return data_mc
+
+def main(argv = None):
+    """
+    Command line entry point. Cleans the line-list and saves it, with the
+    module-level path, save_path and cache_dir as defaults.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Command line arguments, sys.argv[1:] if None.
+
+    """
+    parser = argparse.ArgumentParser(description = "Clean the Covid 19 line-list for the predictors.")
+    parser.add_argument("--input", default = path, help = "Line-list to clean.")
+    parser.add_argument("--output", default = save_path, help = "Where to save the cleaned dataset.")
+    parser.add_argument("--format", choices = [ext[1:] for ext in clean_formats], 
+                        help = "Save format, replaces the extension of --output.")
+    parser.add_argument("--workers", type = int, help = "Number of processes to clean with.")
+    parser.add_argument("--chunksize", type = int, help = "Stream the line-list this many rows at a time.")
+    parser.add_argument("--cache-dir", default = cache_dir, help = "Cache of earlier runs, 'none' to disable.")
+    parser.add_argument("--cache-size", type = int, default = cache_size, help = "Runs kept in the cache.")
+    parser.add_argument("--checkpoint-dir", help = "Checkpoint every stage here and resume from it.")
+    args = parser.parse_args(argv)
+    output = args.output
+    if args.format is not None:
+        output = os.path.splitext(output)[0] + "." + args.format
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunksize is not None and args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+    if args.cache_size < 1:
+        parser.error("--cache-size must be at least 1")
+    cache = None if args.cache_dir.lower() == "none" else args.cache_dir
+    dataset_cleaner = Dataset(args.input, output, chunksize = args.chunksize, cache_dir = cache, 
+                              checkpoint_dir = args.checkpoint_dir, workers = args.workers,
+                              cache_size = args.cache_size)
+    dataset_cleaner.clean_and_save()
 
-dataset_cleaner = Dataset(path, save_path)
-dataset_cleaner.clean_and_save()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
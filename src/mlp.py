@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy inference for the Neural Network. The Dense stack built by
+nn.model_fn is exported to a plain .npz of weights, which MLP scores with a
+NumPy forward pass, so the trained network can be used without TensorFlow.
+
+    mlp = MLP.from_keras(model)
+    mlp.save("nn.npz")
+    y_pred = MLP.load("nn.npz").predict(x_test)
+
+Citations:
+Numpy: Harris, C.R., Millman, K.J., van der Walt, S.J. et al. Array programming with NumPy.
+            Nature 585, 357–362 (2020). DOI: 0.1038/s41586-020-2649-2
+"""
+import json
+import numpy as np
+
+def relu(x):
+    return np.maximum(x, 0, out = x)
+
+def sigmoid(x):
+    #Written as exp(-|x|) so it never overflows
+    e = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + e), e / (1 + e)).astype(x.dtype)
+
+def linear(x):
+    return x
+
+#Activations of Dense layers which can be exported, by their Keras name
+activations = {"relu": relu, "sigmoid": sigmoid, "linear": linear, "tanh": np.tanh}
+
+class MLP:
+    def __init__(self, kernels, biases, activation_names):
+        """
+        A stack of Dense layers.
+
+        Parameters
+        ----------
+        kernels : List of Numpy Arrays
+            Weights of every layer, of shape (inputs, outputs).
+        biases : List of Numpy Arrays
+            Bias of every layer.
+        activation_names : List of Strings
+            Activation of every layer, see activations.
+
+        """
+        for name in activation_names:
+            if name not in activations:
+                raise ValueError("Activation " + name + " can not be exported")
+        self.kernels = [np.ascontiguousarray(kernel, dtype = np.float32) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype = np.float32) for bias in biases]
+        self.activation_names = list(activation_names)
+
+    @classmethod
+    def from_keras(cls, model):
+        """
+        Exports the weights of a trained Keras Sequential of Dense layers,
+        such as the ones built by nn.model_fn.
+        """
+        kernels, biases, activation_names = [], [], []
+        for layer in model.layers:
+            kernel, bias = layer.get_weights()
+            kernels.append(kernel)
+            biases.append(bias)
+            activation_names.append(layer.get_config()["activation"])
+        return cls(kernels, biases, activation_names)
+
+    def save(self, path):
+        """
+        Saves the weights as an uncompressed .npz.
+        """
+        arrays = {}
+        for i in range(len(self.kernels)):
+            arrays["kernel_" + str(i)] = self.kernels[i]
+            arrays["bias_" + str(i)] = self.biases[i]
+        with open(path, "wb") as f:
+            np.savez(f, activations = np.array(json.dumps(self.activation_names)), **arrays)
+        return
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads weights saved by save.
+        """
+        with np.load(path) as f:
+            activation_names = json.loads(str(f["activations"]))
+            kernels = [f["kernel_" + str(i)] for i in range(len(activation_names))]
+            biases = [f["bias_" + str(i)] for i in range(len(activation_names))]
+        return cls(kernels, biases, activation_names)
+
+    def predict(self, x, batch_size = None):
+        """
+        Forward pass, in float32 like the Keras model.
+
+        Parameters
+        ----------
+        x : Pandas Dataframe or Numpy Array
+            Features.
+        batch_size : Int, optional
+            Unused, the whole of x is one batch. For the same calls as a
+            Keras model.
+
+        Returns
+        -------
+        y : Numpy Array
+            Outputs of the last layer, of shape (samples, outputs), e.g. the
+            probability of death.
+
+        """
+        a = np.asarray(x, dtype = np.float32)
+        for kernel, bias, name in zip(self.kernels, self.biases, self.activation_names):
+            a = a @ kernel
+            a += bias
+            a = activations[name](a)
+        return a
@@ -2,8 +2,10 @@
 
 """
 Code to train, evaluate and save the Neural Network trained on the cleaned datset. 
+TensorFlow is only imported by the functions which need it.
 Use the cleaned dataset (from CV19_data_cleaner.py). You can set the hyperparameters
-for learning_rate_initial and list of layers for the number of Dense layers you want to train
+for learning_rate_initial and list of layers for the number of Dense layers you want to train,
+and the batch size and input pipeline (see make_dataset and stream_dataset).
 
 Citations:
 Pandas:  McKinney, Proceedings of the 9th Python in Science Conference, Volume 445, 2010.
@@ -14,59 +16,302 @@ Tensorflow: Martín et al., TensorFlow: Large-scale machine learning on heteroge
                 2015. Software available from tensorflow.org
 
 """
-import sys
+import argparse
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+#Plots are saved to files, so no display is needed
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from sklearn import metrics, model_selection
-import tensorflow as tf
+import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
+from sklearn import metrics, model_selection
+from src.clean_covid_dataset import clean_format, labels_path, feature_columns
+from src.resample import resampled_split, test_size, seed
+from src.registry import save_model
+from src.mlp import MLP
 
 #Hyperparamters
 learning_rate_initial = 0.01
+#Can add more learning rates to sweep as necessary, learning_rate_initial if None
+learning_rates = None
 #Can add more lists of neuron lengths and sizes as necessary
 list_of_layers = [[100,70,50,20]]
-def train_and_save_nn(learning_rate_initial, list_of_layers):
-    path = "build\\cleandata.csv"
-    data = pd.read_csv(path)
-    y = data.pop('outcome')
-    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size=0.15, random_state = 0) #Changed from 0.33
-    x_train, y_train =  SMOTEENN().fit_resample(x_train, y_train)
-    x_train, x_val, y_train, y_val = model_selection.train_test_split(x_train, y_train, test_size=0.1765) #Changed from 0.33
-    dataset = tf.data.Dataset.from_tensor_slices((x_train.values, y_train.values))
-    train_dataset = dataset.shuffle(len(x_train)).batch(64)
-    val_dataset = tf.data.Dataset.from_tensor_slices((x_val.values, y_val.values))
-    val_dataset = val_dataset.shuffle(len(x_val)).batch(64)
-    
-    #Defining the plot boolean
-    input_arguments = str(sys.argv)
-    plot_bool = input_arguments[1]
-    if plot_bool == "True":
-        plot_bool = True
+#Sweep
+workers = 1 #Processes training architectures at once
+threads = 2 #TensorFlow threads of each
+plot_dir = "build\\nn_plots"
+table_path = "build\\nn_sweep.csv" #Ranked results of the sweep
+#Input pipeline
+batch_size = 64 #Larger batches have less overhead per sample, the learning rate is scaled with them
+base_batch_size = 64 #Batch size the learning rates are set for
+cache = True #Keep the training set in memory as tensors after the first epoch
+stream = False #Stream the cleaned file (.csv or .npy) instead of loading and resampling it
+val_size = 0.1765 #Fraction of the training set used for validation
+
+def scaled_learning_rate(learning_rate, batch_size):
+    """
+    Learning rate for a batch size, scaled linearly from learning_rate at
+    base_batch_size.
+    """
+    return learning_rate * batch_size / base_batch_size
+
+def make_dataset(x, y, batch_size = batch_size, shuffle = True, cache = cache):
+    """
+    Builds the input pipeline for an in-memory dataset.
+
+    Parameters
+    ----------
+    x : Pandas Dataframe or Numpy Array
+        Features, cast to float32 here rather than batch by batch.
+    y : Pandas Series or Numpy Array
+        Outcomes.
+    batch_size : Int, optional
+        Samples per batch.
+    shuffle : Bool, optional
+        Whether to reshuffle the samples every epoch.
+    cache : Bool, optional
+        Whether to cache the samples after the first epoch.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Batches of (features, outcomes), prefetched while the model trains.
+
+    """
+    import tensorflow as tf
+    dataset = tf.data.Dataset.from_tensor_slices((np.asarray(x, dtype = np.float32), 
+                                                  np.asarray(y, dtype = np.float32)))
+    if cache:
+        dataset = dataset.cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(x), reshuffle_each_iteration = True)
+    return dataset.batch(batch_size).prefetch(tf.data.experimental.AUTOTUNE)
+
+def stream_split(path):
+    """
+    Splits the rows of a cleaned .csv or .npy file into training, validation
+    and test rows, with the same test rows as resampled_split, reading only
+    the outcomes.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+
+    Returns
+    -------
+    train_rows, val_rows, test_rows : Numpy Arrays
+        Row numbers of each set.
+    labels : Numpy Array
+        Outcome of every row, as float32.
+
+    """
+    ext = clean_format(path)
+    if ext == ".csv":
+        labels = pd.read_csv(path, usecols = ["outcome"])["outcome"].values
+    elif ext == ".npy":
+        labels = np.load(labels_path(path), mmap_mode = "r")
     else:
-        plot_bool = False
-    
-    def find_callbacks():
-        return [
-            tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=50),
-            tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.1, patience=10, verbose=0,
-        mode='auto', min_delta=0.0001, cooldown=0, min_lr=0)]
-    
-    def model_fn(layers):
-        layers_list = []
-        for i in range(len(layers)):
-            # layers_list.append(tf.keras.layers.Dropout(0.2))
-            layers_list.append(tf.keras.layers.Dense(layers[i],activation='relu'))
-        layers_list.append(tf.keras.layers.Dense(1, activation="sigmoid"))
-        model = tf.keras.Sequential(layers_list)
-        model.compile(optimizer= tf.keras.optimizers.Adam(),
-                      loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
-                      metrics=['accuracy', 'Precision','Recall',tf.keras.metrics.AUC(name = "auc")])
-        return model
-    def run_plot(layers):
-        model = model_fn(layers)
-        history = model.fit(train_dataset, epochs=10000, verbose = 0, 
-                            validation_data = val_dataset, callbacks = find_callbacks())
-        model.save("nn_class")
+        raise ValueError("Only .csv and .npy cleaned datasets can be streamed")
+    rows = np.arange(len(labels))
+    train_rows, test_rows = model_selection.train_test_split(rows, test_size = test_size, random_state = seed)
+    train_rows, val_rows = model_selection.train_test_split(train_rows, test_size = val_size, random_state = seed)
+    return train_rows, val_rows, test_rows, np.asarray(labels, dtype = np.float32)
+
+def stream_features(path, n_rows, chunksize = 100000):
+    """
+    Memory map of the features of a cleaned .csv or .npy file. A .csv can
+    only be read in order, so its features are first copied, chunksize
+    rows at a time, into a temporary .npy, deleted once the returned
+    directory is.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    n_rows : Int
+        Number of rows of the file.
+    chunksize : Int, optional
+        Rows of a .csv copied at once.
+
+    Returns
+    -------
+    x : Numpy Memmap
+        Features, one column per entry of feature_columns.
+    directory : TemporaryDirectory
+        Directory of the copy, None for a .npy.
+
+    """
+    if clean_format(path) == ".npy":
+        return np.load(path, mmap_mode = "r"), None
+    directory = tempfile.TemporaryDirectory()
+    x = np.lib.format.open_memmap(os.path.join(directory.name, "features.npy"), mode = "w+",
+                                  dtype = np.float32, shape = (n_rows, len(feature_columns)))
+    start = 0
+    for chunk in pd.read_csv(path, usecols = feature_columns, chunksize = chunksize):
+        x[start:start + len(chunk)] = chunk.loc[:,feature_columns].values
+        start += len(chunk)
+    x.flush()
+    return x, directory
+
+def row_blocks(rows, block_size, rng = None):
+    """
+    Splits rows into blocks read at once, each in file order. With rng, the
+    rows are permuted first, so every pass reads them in a new order;
+    otherwise they are read in file order.
+    """
+    rows = np.sort(rows) if rng is None else rng.permutation(rows)
+    for start in range(0, len(rows), block_size):
+        yield np.sort(rows[start:start + block_size])
+    return
+
+def stream_dataset(path, rows, labels, batch_size = batch_size, shuffle = True, shuffle_buffer = 10000):
+    """
+    Builds the input pipeline for some rows of a cleaned .csv or .npy file,
+    reading the file as it trains rather than loading it first (see
+    stream_features).
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    rows : Numpy Array
+        Row numbers to use, see stream_split.
+    labels : Numpy Array
+        Outcome of every row of the file.
+    batch_size : Int, optional
+        Samples per batch.
+    shuffle : Bool, optional
+        Whether to read the rows in a new random order every epoch, and
+        shuffle them further shuffle_buffer at a time. Otherwise they are
+        read in file order.
+
+    Returns
+    -------
+    dataset : tf.data.Dataset
+        Batches of float32 (features, outcomes), prefetched.
+
+    """
+    import tensorflow as tf
+    x, directory = stream_features(path, len(labels))
+    #Seeded, and advanced by every epoch
+    rng = np.random.RandomState(seed) if shuffle else None
+    def read_rows():
+        #Read from the memory map a block of rows at a time
+        for block in row_blocks(rows, shuffle_buffer, rng):
+            yield np.asarray(x[block], dtype = np.float32), labels[block]
+        return
+    #Keeps the temporary copy of a .csv for as long as the dataset uses it
+    read_rows.directory = directory
+    dataset = tf.data.Dataset.from_generator(read_rows, output_signature = (
+        tf.TensorSpec(shape = (None, len(feature_columns)), dtype = tf.float32),
+        tf.TensorSpec(shape = (None,), dtype = tf.float32))).unbatch()
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, reshuffle_each_iteration = True)
+    return dataset.batch(batch_size).prefetch(tf.data.experimental.AUTOTUNE)
+
+def load_datasets(path):
+    """
+    Builds the training, validation and test pipelines (see make_dataset
+    and stream_dataset).
+
+    Returns
+    -------
+    train_dataset, val_dataset, test_dataset : tf.data.Datasets
+        Batches of (features, outcomes).
+    y_test : Numpy Array
+        Test outcomes, in the order of test_dataset.
+    class_weight : Dict
+        Weight of each class when streaming, None when resampled.
+
+    """
+    if stream:
+        #Not resampled, the classes are weighted instead
+        train_rows, val_rows, test_rows, labels = stream_split(path)
+        train_dataset = stream_dataset(path, train_rows, labels)
+        val_dataset = stream_dataset(path, val_rows, labels, shuffle = False)
+        test_dataset = stream_dataset(path, test_rows, labels, shuffle = False)
+        y_test = labels[np.sort(test_rows)]
+        counts = np.bincount(labels[train_rows].astype(int), minlength = 2)
+        class_weight = {i: len(train_rows) / (2 * counts[i]) for i in range(2)}
+    else:
+        x_train, x_test, y_train, y_test = resampled_split(path)
+        #Seeded, so every candidate of a sweep is validated on the same rows
+        x_train, x_val, y_train, y_val = model_selection.train_test_split(x_train, y_train, test_size=val_size, random_state = seed) #Changed from 0.33
+        train_dataset = make_dataset(x_train, y_train)
+        val_dataset = make_dataset(x_val, y_val, shuffle = False)
+        test_dataset = make_dataset(x_test, y_test, shuffle = False)
+        y_test = np.asarray(y_test)
+        class_weight = None
+    return train_dataset, val_dataset, test_dataset, y_test, class_weight
+
+def find_callbacks():
+    import tensorflow as tf
+    return [
+        #Back to the epoch with the lowest validation loss, so that is the model evaluated and saved
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=50, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.1, patience=10, verbose=0,
+    mode='auto', min_delta=0.0001, cooldown=0, min_lr=0)]
+
+def model_fn(layers, learning_rate):
+    import tensorflow as tf
+    layers_list = []
+    for i in range(len(layers)):
+        # layers_list.append(tf.keras.layers.Dropout(0.2))
+        layers_list.append(tf.keras.layers.Dense(layers[i],activation='relu'))
+    layers_list.append(tf.keras.layers.Dense(1, activation="sigmoid"))
+    model = tf.keras.Sequential(layers_list)
+    model.compile(optimizer= tf.keras.optimizers.Adam(learning_rate = scaled_learning_rate(learning_rate, batch_size)),
+                  loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
+                  metrics=['accuracy', 'Precision','Recall',tf.keras.metrics.AUC(name = "auc")])
+    return model
+
+def candidate_name(layers, learning_rate):
+    """
+    Name of an architecture and learning rate in plots, e.g. 100-70_lr0.01
+    """
+    return "-".join(str(n) for n in layers) + "_lr" + str(learning_rate)
+
+def run_plot(path, layers, learning_rate, plot_dir = None, candidate_dir = None):
+    """
+    Trains one architecture to early stopping, evaluates it on the test set
+    and saves it to candidate_dir, from where the sweep registers the best
+    (see register_best).
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    layers : List of Ints
+        Neurons of every hidden Dense layer.
+    learning_rate : Float
+        Learning rate at base_batch_size, see scaled_learning_rate.
+    plot_dir : String, optional
+        If given, the accuracy, loss and ROC plots are saved there as png.
+    candidate_dir : String, optional
+        If given, the Keras model is saved there, under candidate_name.
+
+    Returns
+    -------
+    result : Dict
+        The test metrics (model.metrics_names, also as a dict under 
+        "metrics"), the validation loss and AUC of the model returned, the
+        number of epochs,
+        the ROC curve and loss histories for plotting, and the model, as
+        model_path and as its NumPy export (mlp).
+
+    """
+    train_dataset, val_dataset, test_dataset, y_test, class_weight = load_datasets(path)
+    model = model_fn(layers, learning_rate)
+    history = model.fit(train_dataset, epochs=10000, verbose = 0, 
+                        validation_data = val_dataset, callbacks = find_callbacks(),
+                        class_weight = class_weight)
+    name = candidate_name(layers, learning_rate)
+    if plot_dir is not None:
+        fig = plt.figure()
         plt.plot(history.history['accuracy'])
         plt.plot(history.history['val_accuracy'])
         plt.plot(history.history['auc'])
@@ -75,70 +320,200 @@ def train_and_save_nn(learning_rate_initial, list_of_layers):
         plt.ylabel('accuracy')
         plt.xlabel('epoch')
         plt.legend(['train_acc', 'val_acc', "train_auc","val_auc"], loc='upper left')
-        plt.show()
+        fig.savefig(os.path.join(plot_dir, name + "_accuracy.png"))
+        plt.close(fig)
         # summarize history for loss
+        fig = plt.figure()
         plt.plot(history.history['loss'])
         plt.plot(history.history['val_loss']) 
         plt.title('model loss')
         plt.ylabel('loss')
         plt.xlabel('epoch')
         plt.legend(['train', 'val'], loc='upper left')
-        plt.show()
-        results = model.evaluate(x_test, y_test, verbose = 0)
-        y_pred = model.predict(x_test)
-        fpr, tpr, _ = metrics.roc_curve(y_test, y_pred)  
+        fig.savefig(os.path.join(plot_dir, name + "_loss.png"))
+        plt.close(fig)
+    results = model.evaluate(test_dataset, verbose = 0)
+    val_results = dict(zip(model.metrics_names, model.evaluate(val_dataset, verbose = 0)))
+    model_path = None
+    if candidate_dir is not None:
+        model_path = os.path.join(candidate_dir, name)
+        model.save(model_path)
+    y_pred = model.predict(test_dataset)
+    fpr, tpr, _ = metrics.roc_curve(y_test, y_pred)  
+    if plot_dir is not None:
+        fig = plt.figure()
         plt.scatter(fpr, tpr)
         plt.ylabel('True Positive Rate')
         plt.xlabel('False Positive Rate')
-        plt.show()  
-        return results, fpr,tpr, history.history['loss'], history.history['val_loss']
-    values_holder = []
-    fpr_holder = []
-    tpr_holder = []
-    loss_holder = []
-    val_loss_holder = []
-    
-    for i in range(len(list_of_layers)):
-        values, fpr, tpr, loss, val_loss = run_plot(list_of_layers[i])
-        values_holder.append(values)
-        fpr_holder.append(fpr)
-        tpr_holder.append(tpr)
-        loss_holder.append(loss)
-        val_loss_holder.append(val_loss)
-    
-    color_scheme = ['lightcoral', "orange", "palegoldenrod", "seagreen", "deepskyblue", "mediumpurple"]
-    
-    def loss_plot(loss, val_loss):
-        for i in range(len(loss)):
-            plt.plot(loss[i], label = 'loss'+str(i), color = color_scheme[i])
-            plt.plot(val_loss[i], label = "val_loss"+str(i), ls = '-.', color = color_scheme[i])
-        plt.ylabel('loss')
-        plt.xlabel('epoch')
-        plt.legend(loc='upper left')
-        plt.show()
-        return
-    
-    def roc_plot(fpr, tpr):
-        for i in range(len(fpr)):
-            plt.scatter(fpr[i], tpr[i], label = str(i), color = color_scheme[i], s = 5)
-        plt.ylabel('True Positive Rate')
-        plt.xlabel('False Positive Rate')
-        plt.legend(loc='lower left')
-        plt.show()
-        return    
-    if plot_bool:
-        loss_plot(loss_holder, val_loss_holder)
-        roc_plot(fpr_holder, tpr_holder)
-        
-    with open("holder.txt", 'a') as f:
-        f.write('\n')
-        f.write(str(values_holder))
+        fig.savefig(os.path.join(plot_dir, name + "_roc.png"))
+        plt.close(fig)
+    result = dict(zip(model.metrics_names, results))
+    result.update({"layers": str(layers), "learning_rate": learning_rate,
+                   "metrics": dict(zip(model.metrics_names, results)),
+                   "hyperparameters": {"layers": layers, "learning_rate_initial": learning_rate,
+                                       "batch_size": batch_size, 
+                                       "learning_rate": scaled_learning_rate(learning_rate, batch_size),
+                                       "stream": stream},
+                   "model_path": model_path,
+                   #NumPy export of the same network, which scores without TensorFlow (see src/mlp.py)
+                   "mlp": MLP.from_keras(model),
+                   "epochs": len(history.history['loss']),
+                   "val_loss": val_results["loss"],
+                   "val_auc": val_results["auc"],
+                   "fpr": fpr, "tpr": tpr, "loss_history": history.history['loss'], 
+                   "val_loss_history": history.history['val_loss']})
+    return result
+
+def pin_threads(threads):
+    """
+    Limits TensorFlow in a process to a number of threads, so the workers
+    of a sweep do not compete for the same cores. Must run before the
+    process builds any model, unless it already has that many threads.
+    """
+    import tensorflow as tf
+    if (tf.config.threading.get_intra_op_parallelism_threads() != threads
+            or tf.config.threading.get_inter_op_parallelism_threads() != 1):
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
     return
 
-train_and_save_nn(learning_rate_initial, list_of_layers)
+def train_candidate(args):
+    return run_plot(*args)
+
+def register_best(path, result):
+    """
+    Saves a candidate to the registry as the next version of nn, and its
+    NumPy export as the next version of nn_mlp.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    result : Dict
+        Result of the candidate, see run_plot.
+
+    Returns
+    -------
+    version : Int
+        Version of nn it was saved as.
+
+    """
+    from tensorflow import keras
+    model = keras.models.load_model(result["model_path"])
+    version = save_model(model, "nn", "keras", path, hyperparameters = result["hyperparameters"],
+                         metrics = result["metrics"])
+    save_model(result["mlp"], "nn_mlp", "mlp", path,
+               hyperparameters = dict(result["hyperparameters"], keras_version = version),
+               metrics = result["metrics"])
+    return version
 
-    
+def sweep(path, list_of_layers, learning_rates, workers = workers, threads = threads, plot_dir = None):
+    """
+    Trains every architecture with every learning rate, each in one of
+    workers worker processes limited to threads threads, and ranks them.
+    Only the best candidate is registered, so the scripts loading the latest
+    version of nn and nn_mlp get it.
 
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    list_of_layers : List of Lists of Ints
+        Architectures, see run_plot.
+    learning_rates : List of Floats
+        Learning rates, see run_plot.
+    workers : Int, optional
+        Worker processes. With 1, the candidates are trained in this process.
+    threads : Int, optional
+        TensorFlow threads per worker process, or of this process with 1
+        worker.
+    plot_dir : String, optional
+        If given, the plots of every candidate and of the sweep are saved
+        there as png.
 
+    Returns
+    -------
+    table : Pandas Dataframe
+        One row per candidate, best validation AUC first, with the version
+        the best was registered as.
+    results : List of Dicts
+        Result of every candidate (see run_plot), in the order trained.
+
+    """
+    if plot_dir is not None:
+        os.makedirs(plot_dir, exist_ok = True)
+    #The candidates are saved here until the best is known
+    with tempfile.TemporaryDirectory() as candidate_dir:
+        candidates = [(path, layers, learning_rate, plot_dir, candidate_dir) 
+                      for layers in list_of_layers for learning_rate in learning_rates]
+        if workers == 1:
+            pin_threads(threads)
+            results = [train_candidate(candidate) for candidate in candidates]
+        else:
+            if not stream:
+                #Resampled once here, so the workers all read it from the cache (see
+                #resampled_split) rather than each running SMOTEENN on a cold cache
+                resampled_split(path)
+            #Spawned rather than forked, as TensorFlow can not be used after a fork
+            with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context("spawn"),
+                                     initializer = pin_threads, initargs = (threads,)) as executor:
+                results = list(executor.map(train_candidate, candidates))
+        best = max(range(len(results)), key = lambda i: results[i]["val_auc"])
+        version = register_best(path, results[best])
+    for i, result in enumerate(results):
+        result["version"] = version if i == best else None
+    not_in_table = ["fpr", "tpr", "loss_history", "val_loss_history", "metrics", "hyperparameters",
+                    "model_path", "mlp"]
+    table = pd.DataFrame([{key: value for key, value in result.items() if key not in not_in_table}
+                          for result in results])
+    table = table.sort_values("val_auc", ascending = False).reset_index(drop = True)
+    if plot_dir is not None:
+        loss_plot([result["loss_history"] for result in results], 
+                  [result["val_loss_history"] for result in results], plot_dir)
+        roc_plot([result["fpr"] for result in results], [result["tpr"] for result in results], plot_dir)
+    return table, results
+
+color_scheme = ['lightcoral', "orange", "palegoldenrod", "seagreen", "deepskyblue", "mediumpurple"]
+
+def loss_plot(loss, val_loss, plot_dir):
+    fig = plt.figure()
+    for i in range(len(loss)):
+        color = color_scheme[i % len(color_scheme)]
+        plt.plot(loss[i], label = 'loss'+str(i), color = color)
+        plt.plot(val_loss[i], label = "val_loss"+str(i), ls = '-.', color = color)
+    plt.ylabel('loss')
+    plt.xlabel('epoch')
+    plt.legend(loc='upper left')
+    fig.savefig(os.path.join(plot_dir, "sweep_loss.png"))
+    plt.close(fig)
+    return
+
+def roc_plot(fpr, tpr, plot_dir):
+    fig = plt.figure()
+    for i in range(len(fpr)):
+        plt.scatter(fpr[i], tpr[i], label = str(i), color = color_scheme[i % len(color_scheme)], s = 5)
+    plt.ylabel('True Positive Rate')
+    plt.xlabel('False Positive Rate')
+    plt.legend(loc='lower left')
+    fig.savefig(os.path.join(plot_dir, "sweep_roc.png"))
+    plt.close(fig)
+    return
 
+def train_and_save_nn(learning_rate_initial, list_of_layers, learning_rates = None, workers = workers,
+                      threads = threads, plot_dir = None, table_path = table_path):
+    path = "build\\cleandata.csv" #Or .parquet, .feather or .npy, as saved by the cleaner
+    if learning_rates is None:
+        learning_rates = [learning_rate_initial]
+    table, results = sweep(path, list_of_layers, learning_rates, workers, threads, plot_dir)
+    table.to_csv(table_path, index = False)
+    print(table.to_string())
+    return table
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Train and rank Neural Network architectures.")
+    parser.add_argument("--plot", action = "store_true", help = "Save the plots to " + plot_dir + ".")
+    parser.add_argument("--workers", type = int, default = workers, help = "Worker processes.")
+    parser.add_argument("--threads", type = int, default = threads, help = "TensorFlow threads per worker, or of this process with --workers 1.")
+    args = parser.parse_args()
+    train_and_save_nn(learning_rate_initial, list_of_layers, learning_rates, args.workers, args.threads,
+                      plot_dir if args.plot else None)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Online preprocessing of new patient records for scoring. A Preprocessor
+applies the encodings of src/clean_covid_dataset.py and the min-max scaling
+saved by the cleaner to single records (transform_record) or to a batch of
+them (transform_batch), giving ready-to-score float32 feature vectors in the
+order of feature_columns.
+
+    preprocessor = Preprocessor("build\\cleandata.csv")
+    x = preprocessor.transform_record({"age": "50-59", "sex": "male",
+                                       "symptoms": "cough, fever"})
+"""
+import math
+import re
+from datetime import datetime
+import numpy as np
+from src.clean_covid_dataset import (Dataset, load_bounds, bounds_path, save_path, clean_columns,
+                                     feature_columns, age_ranges, default_vocabulary)
+
+#Same split patterns and date format as the cleaning stages
+symptom_separators = re.compile(r"[,:;]")
+chronic_separators = re.compile(r"[,:]")
+date_format = "%d.%m.%Y"
+first_day = datetime(2019, 1, 1)
+
+def is_missing(x):
+    """
+    Whether a field of a record is empty, i.e. None or NaN
+    """
+    return x is None or (isinstance(x, float) and math.isnan(x))
+
+class Preprocessor:
+    def __init__(self, clean_path = save_path, vocabulary = None, bounds = None):
+        """
+        Parameters
+        ----------
+        clean_path : String, optional
+            Location of the cleaned training data, whose bounds (see
+            bounds_path) are used to scale. The cleaner's save_path by default.
+        vocabulary : Mapping, optional
+            Lookup tables from load_vocabulary, the bundled ones by default.
+            Must be the vocabulary the training data was cleaned with.
+        bounds : Tuple of Numpy Arrays, optional
+            Minimum and maximum of each of clean_columns, to use instead of
+            the ones saved with clean_path.
+
+        """
+        if vocabulary is None:
+            vocabulary = default_vocabulary
+        self.vocabulary = vocabulary
+        if bounds is None:
+            bounds = load_bounds(bounds_path(clean_path))
+        #Scaling of the feature columns only
+        features = [clean_columns.index(column) for column in feature_columns]
+        self.min_val = np.asarray(bounds[0], dtype = np.float32)[features]
+        self.range_val = np.asarray(bounds[1], dtype = np.float32)[features] - self.min_val
+        #Used by transform_batch, which runs the cleaning stages themselves
+        self.__dataset = Dataset(None, clean_path, vocabulary = vocabulary)
+        #Tier of every known symptom or synonym of one
+        synonyms = vocabulary["symptom_synonyms"]
+        tiers = vocabulary["symptom_tiers"]
+        self.__symptom_tiers = dict(tiers)
+        for name in synonyms:
+            if synonyms[name] in tiers:
+                self.__symptom_tiers[name] = tiers[synonyms[name]]
+            else:
+                self.__symptom_tiers.pop(name, None)
+
+    def __age(self, x):
+        if is_missing(x):
+            return -1
+        if type(x) == str:
+            x = age_ranges.get(x, x)
+        return int(x)
+
+    def __sex(self, x):
+        if x == "female":
+            return 1
+        elif x == "male":
+            return 0
+        elif type(x) != str:
+            return -1
+        raise ValueError("Biological gender must be either female or male")
+
+    def __coordinate(self, x):
+        if is_missing(x):
+            return -1
+        return np.float32(x)
+
+    def __date(self, x, onset = False):
+        if type(x) != str:
+            return -1
+        if onset:
+            #Needed to fix typos: a leading "-" and ranges of dates
+            if x.startswith("-"):
+                x = x[1:]
+            x = x[:10]
+        days = (datetime.strptime(x, date_format) - first_day).days
+        if days < 0:
+            raise ValueError("Date can not be from before 1st of January, 2019")
+        if days > np.iinfo(np.int16).max:
+            raise ValueError("Date can not be more than 32767 days after 1st of January, 2019")
+        return days
+
+    def __symptoms(self, x):
+        if type(x) != str:
+            return -1
+        synonyms = self.vocabulary["symptom_synonyms"]
+        names = [name.strip() for name in symptom_separators.split(x)]
+        tiers = [self.__symptom_tiers.get(name) for name in names]
+        if None not in tiers:
+            return max(tiers)
+        #Entries with unknown symptoms are either outliers or invalid
+        entry = ", ".join(synonyms.get(name, name) for name in names)
+        if entry not in self.vocabulary["symptom_outliers"]:
+            raise ValueError("Not a valid symptom")
+        replacement = self.vocabulary["symptom_outliers"][entry]
+        if type(replacement) != str:
+            return -1
+        return max(self.vocabulary["symptom_tiers"][name.strip()] for name in replacement.split(","))
+
+    def __chronic_disease(self, x):
+        if type(x) != str or x in self.vocabulary["chronic_outliers"]:
+            return [-1, -1, -1, -1]
+        synonyms = self.vocabulary["chronic_synonyms"]
+        diabetes = self.vocabulary["diabetes"]
+        hypertension = self.vocabulary["hypertension"]
+        severe_underlying = self.vocabulary["severe_underlying"]
+        names = [synonyms.get(name.strip(), name.strip()) for name in chronic_separators.split(x)]
+        #In the order of feature_columns
+        return [int(any(name in diabetes for name in names)),
+                int(any(name in hypertension for name in names)),
+                int(any(name in severe_underlying for name in names)),
+                int(any(name not in diabetes and name not in hypertension
+                        and name not in severe_underlying for name in names))]
+
+    def transform_record(self, record):
+        """
+        Encodes and scales one patient record, in plain Python
+
+        Parameters
+        ----------
+        record : Mapping
+            Fields of the line-list (see record_columns). Missing fields are
+            taken as empty.
+        Returns
+        -------
+        x : Numpy Array
+            Normalized float32 features, in the order of feature_columns.
+
+        """
+        get = record.get
+        values = [self.__age(get("age")),
+                  self.__sex(get("sex")),
+                  self.__coordinate(get("latitude")),
+                  self.__coordinate(get("longitude")),
+                  self.__date(get("date_onset_symptoms"), onset = True),
+                  self.__date(get("date_admission_hospital")),
+                  self.__symptoms(get("symptoms"))]
+        values += self.__chronic_disease(get("chronic_disease"))
+        x = np.array(values, dtype = np.float32)
+        x -= self.min_val
+        x /= self.range_val
+        return x
+
+    def transform_batch(self, data):
+        """
+        Encodes and scales a batch of patient records with the (vectorized)
+        cleaning stages
+
+        Parameters
+        ----------
+        data : Pandas Dataframe
+            Records with (some of) the titles in record_columns.
+        Returns
+        -------
+        x : Numpy Array
+            Normalized float32 features, one row per record and one column
+            per entry of feature_columns.
+
+        """
+        x = self.__dataset.encode_features(data)
+        x -= self.min_val
+        x /= self.range_val
+        return x
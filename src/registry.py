@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the trained models. Every model is saved under
+registry_dir\\<name>\\<version>, with the model itself and a metadata.json
+recording the hash of the cleaned data it was trained on, its
+hyperparameters, its test metrics and the normalization bounds of the data.
+Versions count up from 1 for every name.
+
+    version = save_model(model, "rf", "sklearn", "build\\cleandata.csv", metrics = {...})
+    rf = load_model("rf").model
+
+Scikit-learn models are saved with joblib, TensorFlow models as a Keras
+SavedModel, and the NumPy exports of both (see src/mlp.py and src/forest.py)
+as .npz. Loading only
+reads the metadata; the model is read on first use of RegisteredModel.model,
+and TensorFlow is only imported then, for a Keras model.
+
+Citations:
+sklearn: Machine Learning in Python, Pedregosa et al., JMLR 12, pp. 2825-2830, 2011.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+import joblib
+import numpy as np
+from src.clean_covid_dataset import file_hash, bounds_path, load_bounds, clean_columns
+from src.mlp import MLP
+from src.forest import Forest
+
+registry_dir = "build\\models"
+#Ways a model can be saved, see save_model
+model_kinds = ["sklearn", "keras", "mlp", "forest"]
+#Order of the test metrics the training scripts compute
+metric_names = ["accuracy", "precision", "recall", "roc_auc"]
+#Models scored by default (see src/score.py, src/serve.py and src/batch_score.py).
+#rf_forest and nn_mlp are the compact exports of rf and nn (see src/forest.py
+#and src/mlp.py), which give the same scores, the latter without loading TensorFlow
+model_names = ["svm", "rf_forest", "nn_mlp"]
+#Name of the saved model in its version directory, by kind
+artifact_names = {"sklearn": "model.joblib", "keras": "model", "mlp": "model.npz", "forest": "model.npz"}
+
+def json_safe(x):
+    """
+    Converts a hyperparameter or metric to something json can write: numpy
+    scalars and arrays to Python ones, anything else unknown to its repr.
+    """
+    if isinstance(x, dict):
+        return {str(key): json_safe(value) for key, value in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [json_safe(value) for value in x]
+    if isinstance(x, np.ndarray):
+        return json_safe(x.tolist())
+    if isinstance(x, np.generic):
+        return x.item()
+    if x is None or isinstance(x, (bool, int, float, str)):
+        return x
+    return repr(x)
+
+def list_versions(name, registry = registry_dir):
+    """
+    Versions of the model saved as name, oldest first.
+    """
+    directory = os.path.join(registry, name)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(version) for version in os.listdir(directory) if version.isdigit())
+
+def save_model(model, name, kind, data_path, hyperparameters = None, metrics = None,
+               compress = 0, registry = registry_dir):
+    """
+    Saves a trained model as the next version of name.
+
+    Parameters
+    ----------
+    model : Estimator, Keras Model, MLP or Forest
+        Trained model.
+    name : String
+        Name of the model in the registry, e.g. "rf".
+    kind : String
+        "sklearn" (saved with joblib), "keras" (saved as a SavedModel),
+        "mlp" or "forest" (saved as .npz).
+    data_path : String
+        Location of the cleaned data the model was trained on. Its hash,
+        and its bounds if saved, go in the metadata.
+    hyperparameters : Dict, optional
+        Hyperparameters of the model, model.get_params() for a scikit-learn
+        model by default.
+    metrics : Dict, optional
+        Test metrics of the model.
+    compress : Int, optional
+        Joblib compression level. 0 by default, as joblib can only memory
+        map the arrays of uncompressed files (see RegisteredModel.model).
+        Worth setting for forests, whose trees are read in either way.
+    registry : String, optional
+        Directory of the registry.
+
+    Returns
+    -------
+    version : Int
+        Version the model was saved as.
+
+    """
+    if kind not in model_kinds:
+        raise ValueError("Model kind must be sklearn, keras, mlp or forest")
+    if hyperparameters is None and kind == "sklearn":
+        hyperparameters = model.get_params(deep = False)
+    metadata = {"name": name, "kind": kind,
+                "created": datetime.now(timezone.utc).isoformat(),
+                "data_path": data_path, "data_hash": file_hash(data_path),
+                "hyperparameters": json_safe(hyperparameters or {}),
+                "metrics": json_safe(metrics or {}),
+                "bounds": None, "compress": compress if kind == "sklearn" else 0}
+    if os.path.isfile(bounds_path(data_path)):
+        min_val, max_val = load_bounds(bounds_path(data_path))
+        metadata["bounds"] = {"columns": clean_columns, "min": min_val.tolist(),
+                              "max": max_val.tolist()}
+
+    #Written to a staging directory first, so a version is never half saved
+    directory = os.path.join(registry, name)
+    os.makedirs(directory, exist_ok = True)
+    staging = tempfile.mkdtemp(dir = directory)
+    try:
+        artifact = os.path.join(staging, artifact_names[kind])
+        if kind == "sklearn":
+            joblib.dump(model, artifact, compress = compress)
+        else:
+            model.save(artifact)
+        while True:
+            versions = list_versions(name, registry)
+            version = versions[-1] + 1 if versions else 1
+            metadata["version"] = version
+            with open(os.path.join(staging, "metadata.json"), "w", encoding = "utf-8") as f:
+                json.dump(metadata, f, indent = 4)
+            try:
+                os.rename(staging, os.path.join(directory, str(version)))
+                break
+            except OSError:
+                #Another process saved this version first
+                if not os.path.isdir(os.path.join(directory, str(version))):
+                    raise
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors = True)
+        raise
+    return version
+
+class RegisteredModel:
+    def __init__(self, name, version = None, registry = registry_dir):
+        """
+        A saved model. Only the metadata is read here; see model.
+
+        Parameters
+        ----------
+        name : String
+            Name of the model in the registry.
+        version : Int, optional
+            Version to load, the latest by default.
+        registry : String, optional
+            Directory of the registry.
+
+        """
+        if version is None:
+            versions = list_versions(name, registry)
+            if not versions:
+                raise FileNotFoundError("No saved versions of " + name + " in " + registry)
+            version = versions[-1]
+        self.directory = os.path.join(registry, name, str(version))
+        with open(os.path.join(self.directory, "metadata.json"), encoding = "utf-8") as f:
+            self.metadata = json.load(f)
+        self.name = name
+        self.version = version
+        self.__model = None
+
+    @property
+    def model(self):
+        """
+        The model, read in on first use. The arrays a scikit-learn model
+        keeps as attributes (e.g. the support vectors of an SVM) are memory
+        mapped rather than read in when the file is uncompressed. The trees
+        of a forest are not, as scikit-learn copies their nodes into new
+        arrays when it unpickles them.
+        """
+        if self.__model is None:
+            artifact = os.path.join(self.directory, artifact_names[self.metadata["kind"]])
+            if self.metadata["kind"] == "sklearn":
+                #Compressed files can not be memory mapped
+                mmap_mode = None if self.metadata.get("compress") else "r"
+                self.__model = joblib.load(artifact, mmap_mode = mmap_mode)
+            elif self.metadata["kind"] == "mlp":
+                self.__model = MLP.load(artifact)
+            elif self.metadata["kind"] == "forest":
+                self.__model = Forest.load(artifact)
+            else:
+                from tensorflow import keras
+                self.__model = keras.models.load_model(artifact)
+        return self.__model
+
+    @property
+    def bounds(self):
+        """
+        Minimum and maximum of the cleaned columns of the training data, as
+        float32 arrays, or None if they were not saved.
+        """
+        if self.metadata["bounds"] is None:
+            return None
+        return (np.array(self.metadata["bounds"]["min"], dtype = np.float32),
+                np.array(self.metadata["bounds"]["max"], dtype = np.float32))
+
+    def check_data(self, data_path):
+        """
+        Whether the cleaned data at data_path is the data the model was
+        trained on.
+        """
+        return file_hash(data_path) == self.metadata["data_hash"]
+
+def common_bounds(registered):
+    """
+    Normalization bounds shared by registered models, so one Preprocessor
+    can scale the features of all of them.
+
+    Parameters
+    ----------
+    registered : List of RegisteredModels
+        Models to be scored together.
+
+    Returns
+    -------
+    bounds : Tuple of Numpy Arrays
+        Minimum and maximum of the cleaned columns, or None if no model has
+        them saved.
+
+    """
+    bounds = [model.bounds for model in registered if model.bounds is not None]
+    for other in bounds[1:]:
+        if not (np.array_equal(bounds[0][0], other[0]) and np.array_equal(bounds[0][1], other[1])):
+            raise ValueError("The models were trained on data with different bounds")
+    return bounds[0] if bounds else None
+
+def load_model(name, version = None, registry = registry_dir):
+    """
+    Finds a saved model, see RegisteredModel.
+    """
+    return RegisteredModel(name, version, registry)
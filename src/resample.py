@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Train/test split and SMOTEENN resampling of the cleaned dataset, shared by
+the training scripts. The resampled training set is cached in resample_dir,
+keyed on the cleaned data, the test size, the seed and the Resampler, so it
+is computed once per pipeline run rather than once per model.
+
+Citations:
+sklearn: Machine Learning in Python, Pedregosa et al., JMLR 12, pp. 2825-2830, 2011.
+SMOTEENN: Imbalanced-learn: A Python Toolbox to Tackle the Curse of Imbalanced Datasets in Machine Learning,
+            Guillaume et al., JMLR 18 (17), pp. 1-5, 2017.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn import model_selection
+from sklearn.base import BaseEstimator
+from sklearn.neighbors import NearestNeighbors
+#Private to scikit-learn, but imblearn 0.8 only takes neighbour estimators
+#which subclass it, and imports it from here too (see requirements.txt)
+from sklearn.neighbors._base import KNeighborsMixin
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import EditedNearestNeighbours, RandomUnderSampler
+from src.clean_covid_dataset import load_clean, file_hash, saved_files
+
+resample_dir = "build\\resample_cache"
+#Fraction of the cleaned data held out for testing, by every model and by score.py
+test_size = 0.15
+#Seed of the split and of the resampling
+seed = 0
+#Processes the nearest neighbour searches run on, all cores by default
+n_jobs = -1
+#Neighbour index of SMOTE and ENN, see Resampler
+neighbours_algorithm = "auto"
+#Neighbour indexes scikit-learn can build
+neighbours_algorithms = ["auto", "ball_tree", "kd_tree", "brute"]
+
+class NeighboursIndex(KNeighborsMixin, BaseEstimator):
+    def __init__(self, make_index, n_neighbors, n_jobs = None):
+        """
+        Adapts a nearest neighbour index with only fit and kneighbors (e.g.
+        an approximate one) to the scikit-learn estimator SMOTE and ENN
+        expect, which they clone and query through KNeighborsMixin.
+
+        Parameters
+        ----------
+        make_index : Callable
+            Takes a number of neighbours and returns an unfitted index, with
+            fit(x) and kneighbors(x, n_neighbors, return_distance) as in
+            NearestNeighbors.
+        n_neighbors : Int
+            Neighbours returned by default.
+        n_jobs : Int, optional
+            Not used, the index sets its own parallelism. Only here as ENN
+            sets it on its estimator.
+
+        """
+        self.make_index = make_index
+        self.n_neighbors = n_neighbors
+        self.n_jobs = n_jobs
+
+    def fit(self, x, y = None):
+        self.index_ = self.make_index(self.n_neighbors)
+        self.index_.fit(np.asarray(x))
+        self.n_samples_fit_ = len(x)
+        return self
+
+    def kneighbors(self, X = None, n_neighbors = None, return_distance = True):
+        if X is None:
+            raise ValueError("Neighbours of the fitted samples themselves are not supported")
+        if n_neighbors is None:
+            n_neighbors = self.n_neighbors
+        return self.index_.kneighbors(np.asarray(X), n_neighbors = n_neighbors,
+                                      return_distance = return_distance)
+
+class Resampler:
+    def __init__(self, seed = seed, n_jobs = n_jobs, algorithm = neighbours_algorithm,
+                 k_neighbors = 5, enn_neighbors = 3, max_majority = None, algorithm_key = None):
+        """
+        SMOTEENN with configurable nearest neighbour searches. With the 
+        defaults it resamples exactly as SMOTEENN(random_state = seed).
+
+        Parameters
+        ----------
+        seed : Int, optional
+            Seed of the resampling.
+        n_jobs : Int, optional
+            Processes the neighbour searches run on, -1 for all cores.
+        algorithm : String or Callable, optional
+            Index of the neighbour searches, one of neighbours_algorithms, or
+            a function taking a number of neighbours and returning an 
+            unfitted index with fit and kneighbors (e.g. an approximate 
+            one), see NeighboursIndex.
+        k_neighbors : Int, optional
+            Neighbours SMOTE interpolates between.
+        enn_neighbors : Int, optional
+            Neighbours ENN edits by.
+        max_majority : Int, optional
+            If given, the majority class is first reduced to at most this
+            many samples, chosen at random, so SMOTE and ENN search fewer.
+        algorithm_key : String, optional
+            Name of a callable algorithm and its settings, identifying it in
+            the cache key. Without one, resampling with a callable is not
+            cached, as the function alone does not say what it builds.
+
+        """
+        if not callable(algorithm) and algorithm not in neighbours_algorithms:
+            raise ValueError("Neighbour algorithm must be auto, ball_tree, kd_tree, brute or callable")
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.algorithm = algorithm
+        self.k_neighbors = k_neighbors
+        self.enn_neighbors = enn_neighbors
+        self.max_majority = max_majority
+        self.algorithm_key = algorithm_key
+
+    def __neighbours(self, n_neighbors):
+        if callable(self.algorithm):
+            return NeighboursIndex(self.algorithm, n_neighbors)
+        return NearestNeighbors(n_neighbors = n_neighbors, algorithm = self.algorithm, n_jobs = self.n_jobs)
+
+    def params(self):
+        """
+        Settings which change the output, for the cache key. None if they
+        can not be identified, i.e. for a callable without an algorithm_key.
+        """
+        algorithm = self.algorithm
+        if callable(algorithm):
+            if self.algorithm_key is None:
+                return None
+            algorithm = "callable:" + self.algorithm_key
+        return {"seed": self.seed, "algorithm": algorithm, "k_neighbors": self.k_neighbors,
+                "enn_neighbors": self.enn_neighbors, "max_majority": self.max_majority}
+
+    def fit_resample(self, x, y):
+        """
+        Balances a training set.
+
+        Parameters
+        ----------
+        x : Pandas Dataframe
+            Training features.
+        y : Pandas Series
+            Training outcomes.
+        Returns
+        -------
+        x : Pandas Dataframe
+            Resampled features.
+        y : Pandas Series
+            Resampled outcomes.
+
+        """
+        if self.max_majority is not None:
+            counts = y.value_counts()
+            if counts.iloc[0] > self.max_majority:
+                x, y = RandomUnderSampler(sampling_strategy = {counts.index[0]: self.max_majority},
+                                          random_state = self.seed).fit_resample(x, y)
+        #The index searches one more neighbour than asked, as every sample is its own nearest.
+        #SMOTE keeps the n_jobs of its index, but ENN overwrites it with its own
+        smote = SMOTE(k_neighbors = self.__neighbours(self.k_neighbors + 1), random_state = self.seed)
+        enn = EditedNearestNeighbours(n_neighbors = self.__neighbours(self.enn_neighbors + 1),
+                                      sampling_strategy = "all", n_jobs = self.n_jobs)
+        return SMOTEENN(smote = smote, enn = enn, random_state = self.seed).fit_resample(x, y)
+
+def resample_key(path, test_size = test_size, seed = seed, resampler = None):
+    """
+    Sha256 hex digest identifying a resampled training set: the contents of
+    the cleaned dataset (and its bounds and labels), the test size, the seed
+    and the settings of the resampler (a Resampler(seed) by default). None
+    if the settings of the resampler can not be identified (see params).
+    """
+    if resampler is None:
+        resampler = Resampler(seed)
+    if resampler.params() is None:
+        return None
+    key = {"data": [file_hash(file) for file in saved_files(path) if os.path.isfile(file)],
+           "test_size": test_size, "seed": seed, "resampler": resampler.params()}
+    return hashlib.sha256(json.dumps(key, sort_keys = True).encode("utf-8")).hexdigest()
+
+def resampled_split(path, test_size = test_size, seed = seed, cache_dir = resample_dir, resampler = None):
+    """
+    Splits the cleaned dataset into a training and a test set, and balances
+    the training set with a Resampler. The resampled training set is read 
+    from the cache if it was made before, and saved to it otherwise.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    test_size : Float, optional
+        Fraction of the dataset to test on.
+    seed : Int, optional
+        Seed of the split, and of the default resampler.
+    cache_dir : String, optional
+        Directory of the cache, None to always resample. Not used if the
+        resampler has no cache key (see resample_key).
+    resampler : Resampler, optional
+        Resampler to balance with, Resampler(seed) by default.
+
+    Returns
+    -------
+    x_train : Pandas Dataframe
+        Resampled training features.
+    x_test : Pandas Dataframe
+        Test features.
+    y_train : Pandas Series
+        Resampled training outcomes.
+    y_test : Pandas Series
+        Test outcomes.
+
+    """
+    data = load_clean(path)
+    y = data.pop('outcome')
+    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size = test_size,
+                                                                        random_state = seed)
+    if resampler is None:
+        resampler = Resampler(seed)
+    if cache_dir is not None:
+        key = resample_key(path, test_size, seed, resampler)
+        if key is None:
+            cache_dir = None
+    if cache_dir is not None:
+        cached = os.path.join(cache_dir, key + ".npz")
+        if os.path.isfile(cached):
+            with np.load(cached) as f:
+                return (pd.DataFrame(f["x"], columns = x_train.columns), x_test,
+                        pd.Series(f["y"], name = y_train.name), y_test)
+    x_train, y_train = resampler.fit_resample(x_train, y_train)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok = True)
+        #Written to a temporary file of its own, as other processes may be saving the same key
+        fd, staging = tempfile.mkstemp(dir = cache_dir, suffix = ".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, x = x_train.values, y = y_train.values)
+            os.replace(staging, cached)
+        except BaseException:
+            os.remove(staging)
+            raise
+    return x_train, x_test, y_train, y_test
@@ -2,7 +2,8 @@
 """
 Code to train, evaluate and save the Random Forest trained on the cleaned datset. 
 Use the cleaned dataset (from CV19_data_cleaner.py). If you want to run a gridsearch,
-set the grid search bool to true
+set the grid search bool to true, and choose the search (grid, halving or random, 
+see src/search.py), its budget and the number of processes it runs on.
 
 Citations:
 Pandas:  McKinney, Proceedings of the 9th Python in Science Conference, Volume 445, 2010.
@@ -13,53 +14,50 @@ Numpy: Harris, C.R., Millman, K.J., van der Walt, S.J. et al. Array programming
             Nature 585, 357–362 (2020). DOI: 0.1038/s41586-020-2649-2
 """
 from sklearn.ensemble import RandomForestClassifier
-import pickle
 import numpy as np
-from sklearn import metrics, model_selection
-import pandas as pd
-from imblearn.combine import SMOTEENN
+from src.resample import resampled_split
+from src.registry import save_model, metric_names
+from src.forest import Forest
+from src.search import make_search, report_search
+from src.scoring import evaluate_model
 #To Set:
-path = "build\\cleandata.csv"
+path = "build\\cleandata.csv" #Or .parquet, .feather or .npy, as saved by the cleaner
 grid_search_bool = True
-def train_and_save_rf(path, grid_search_bool):
-    data = pd.read_csv(path)
-    y = data.pop('outcome')
-    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size=0.15, random_state = 0) #Changed from 0.33
-    x_train, y_train =  SMOTEENN().fit_resample(x_train, y_train)
+search = "grid" #All 625 combinations, or "halving" or "random" to prune them
+search_budget = None #Samples for halving, candidates for random, see make_search
+n_jobs = -1 #All cores
+def train_and_save_rf(path, grid_search_bool, search = search, search_budget = search_budget, n_jobs = n_jobs):
+    x_train, x_test, y_train, y_test = resampled_split(path)
     if grid_search_bool:
         max_depth_range = np.logspace(1, 3, 5, dtype = int)
         minsamplesplit = np.logspace(1, 2, 5, dtype = int)
         max_leaf_range = np.logspace(1, 3, 5, dtype = int)
         minsampleleaf = np.logspace(1, 2, 5, dtype = int)
         search_field = dict(min_samples_split= minsamplesplit, min_samples_leaf = minsampleleaf, max_depth = max_depth_range, max_leaf_nodes = max_leaf_range)
+        #The search runs in parallel, so every forest is grown on one core
         model_rf = RandomForestClassifier(max_depth = 100, max_leaf_nodes = 1000, min_samples_leaf = 10, min_samples_split = 17)
-        model = model_selection.GridSearchCV(model_rf, search_field, verbose = 2,scoring = "roc_auc") #Will help find the right values!
+        model = make_search(model_rf, search_field, search, search_budget, n_jobs, scoring = "roc_auc") #Will help find the right values!
         model = model.fit(x_train,y_train)
-        list1 = []
-        list1.append(metrics.accuracy_score(y_test,model.predict(x_test)))
-        list1.append(metrics.precision_score(y_test,model.predict(x_test)))
-        list1.append(metrics.recall_score(y_test,model.predict(x_test)))
-        list1.append(metrics.roc_auc_score(y_test,model.predict(x_test)))
-        with open('holder.txt','a') as f:
-            f.write('\n')
-            f.write(str(list1))
-        #Uncomment the below to see the parameters which return the highest accuracy
-        # print("Best RF:",(model.best_params_, model.best_score_)) #5-fold cross validation is used
+        report_search("RF", model) #5-fold cross validation is used
     else:
-        model_rf = RandomForestClassifier(max_depth = 100, max_leaf_nodes = 1000, min_samples_leaf = 10, min_samples_split = 17)
+        model_rf = RandomForestClassifier(max_depth = 100, max_leaf_nodes = 1000, min_samples_leaf = 10, min_samples_split = 17, n_jobs = n_jobs)
         model = model_rf.fit(x_train,y_train)
-        list1 = []
-        list1.append(metrics.accuracy_score(y_test,model.predict(x_test)))
-        list1.append(metrics.precision_score(y_test,model.predict(x_test)))
-        list1.append(metrics.recall_score(y_test,model.predict(x_test)))
-        list1.append(metrics.roc_auc_score(y_test,model.predict(x_test)))
-        print(list1)
-    file_model = "cv19_rf_best.pkl"
-    with open(file_model, 'wb') as file:
-        pickle.dump(model, file)
+    result = evaluate_model(model, x_test, y_test)
+    list1 = [result[name] for name in metric_names]
+    print(list1)
+    scores = dict(zip(metric_names, list1))
+    if grid_search_bool:
+        scores["cv_roc_auc"] = model.best_score_
+        model = model.best_estimator_
+    #Compressed, as unpickling copies the trees anyway (see RegisteredModel.model)
+    save_model(model, "rf", "sklearn", path, metrics = scores, compress = 3)
+    #Compact copy, which loads and scores faster (see src/forest.py)
+    save_model(Forest.from_sklearn(model), "rf_forest", "forest", path,
+               hyperparameters = model.get_params(deep = False), metrics = scores)
     return
 
-train_and_save_rf(path, grid_search_bool)
+if __name__ == "__main__":
+    train_and_save_rf(path, grid_search_bool)
 
 
 
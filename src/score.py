@@ -3,83 +3,125 @@
 Created on Sun May  2 10:07:28 2021
 
 @author: Percy
+
+Evaluates the latest registered version of each model (see src/registry.py)
+on the test set, and writes a report of their metrics to report_path .json
+and .csv. The scikit-learn models are evaluated at the same time in a
+thread pool (their predict releases the GIL), while the Neural Network is
+evaluated in the main thread. By default it is scored through its NumPy
+export, so TensorFlow is not imported; use --models svm rf nn for the
+Keras model itself. To also save the ROC curves as a png, run
+    python -m src.score --input build\\cleandata.csv --plot
 """
+import argparse
+import json
 import os
-import matplotlib.pyplot as plt
-from sklearn import  metrics, model_selection
-from tensorflow import keras
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import pickle
+from sklearn import model_selection
+from src.clean_covid_dataset import load_clean
+from src.registry import load_model, list_versions, json_safe, metric_names, model_names, registry_dir
+from src.scoring import evaluate_model
+from src.resample import test_size, seed
+
+path = "build\\cleandata.csv" #Or .parquet, .feather or .npy, as saved by the cleaner
+report_path = "build\\results" #.json and .csv are added
+plot_path = "build\\roc.png"
+
+def evaluate_registered(registered, x_test, y_test, data_path):
+    """
+    Evaluates a model from the registry, see evaluate_model.
+    """
+    result = evaluate_model(registered.model, x_test, y_test)
+    result.update({"name": registered.name, "version": registered.version,
+                   "trained_on_this_data": registered.check_data(data_path),
+                   "registered_metrics": registered.metadata["metrics"]})
+    return result
+
+def roc_plot(results, plot_path):
+    #Only imported to plot, so importing this module does not load matplotlib
+    import matplotlib
+    #Plots are saved to files, so no display is needed
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    for result in results:
+        plt.plot(result["fpr"], result["tpr"], label = result["name"])
+    plt.ylabel('True Positive Rate')
+    plt.xlabel('False Positive Rate')
+    plt.legend(loc = 'lower right')
+    fig.savefig(plot_path)
+    plt.close(fig)
+    return
+
+def score(path, names = model_names, workers = None, report_path = report_path, plot_path = None,
+          registry = registry_dir):
+    """
+    Evaluates the latest version of every registered model on the test set.
+
+    Parameters
+    ----------
+    path : String
+        Location of the cleaned dataset.
+    names : List of Strings, optional
+        Models to evaluate. Those never registered are skipped.
+    workers : Int, optional
+        Threads evaluating the scikit-learn models, one per model by default.
+    report_path : String, optional
+        Where to write the report, as report_path + ".json" and ".csv".
+    plot_path : String, optional
+        If given, the ROC curves are saved there.
+    registry : String, optional
+        Directory of the model registry.
+
+    Returns
+    -------
+    results : List of Dicts
+        Metrics, confusion matrix and ROC curve of every model, see
+        evaluate_scores.
 
-path = "build\\cleandata.csv"
-def score(path):
-    data = pd.read_csv(path)
+    """
+    data = load_clean(path)
     y = data.pop('outcome')
-    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size=0.15, random_state = 0)
-    
-    rf_model = "cv19_rf_best.pkl"
-    with open(rf_model, 'rb') as file:
-        rf = pickle.load(file)
-    
-    svm_model = "cv19_svm.pkl"
-    with open(svm_model, 'rb') as file:
-        svm = pickle.load(file)
-    
-    nn = keras.models.load_model("nn_class")
-    
-    def classify_num(list1):
-        for i in range(len(list1)):
-            if list1[i][0] >= 0.5:
-                list1[i][0] = 1
-            else:
-                list1[i][0] = 0
-        return list1
-    
-    
-    def evaluate(data, y_test, model):
-        y_pred = model.predict(data)
-        if model == nn:
-          y_pred = classify_num(y_pred)
-        list1 = []
-        list1.append(metrics.accuracy_score(y_test,y_pred))
-        list1.append(metrics.precision_score(y_test,y_pred))
-        list1.append(metrics.recall_score(y_test,y_pred))
-        list1.append(metrics.roc_auc_score(y_test,y_pred))
-        fpr, tpr, _ = metrics.roc_curve(y_test, y_pred)  
-        C = metrics.confusion_matrix(y_test, y_pred)
-        plt.scatter(fpr, tpr)
-        plt.ylabel('True Positive Rate')
-        plt.xlabel('False Positive Rate') 
-        return C, list1
-        # return di
-    
-    C1, val1 = evaluate(x_test, y_test, rf)
-    C2, val2 = evaluate(x_test, y_test, svm)
-    C3, val3 = evaluate(x_test, y_test, nn)
-    
-    hold_list = []
-    file = open("holder.txt", 'r')
-    data = file.readlines()
-    for lines in data:
-        n = lines.strip()
-        hold_list.append(n)
-    file.close()
-    
-    with open("..\\build\\results.txt") as f:
-        f.write("Results:")
-        f.write("\n")
-        f.write("SVM Scores: " + str(n[0]))
-        f.write("\n")
-        f.write("RF Scores: " + str(n[1]))
-        f.write("\n")
-        f.write("NN Scores: " + str(n[2]))
-    
-    #Clean Up
-    os.remove("holder.txt")
-    return 
+    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size = test_size, random_state = seed) #Same split as the models
 
-score(path)
+    #Latest saved version of each, see src/registry.py
+    registered = []
+    for name in names:
+        if list_versions(name, registry):
+            registered.append(load_model(name, registry = registry))
+        else:
+            print("No saved versions of " + name + ", skipping it")
+    sklearn_models = [model for model in registered if model.metadata["kind"] == "sklearn"]
+    other_models = [model for model in registered if model.metadata["kind"] != "sklearn"]
 
-    
+    with ThreadPoolExecutor(max_workers = workers or max(len(sklearn_models), 1)) as executor:
+        futures = [executor.submit(evaluate_registered, model, x_test, y_test, path) for model in sklearn_models]
+        other_results = [evaluate_registered(model, x_test, y_test, path) for model in other_models]
+        sklearn_results = [future.result() for future in futures]
+    by_name = {result["name"]: result for result in sklearn_results + other_results}
+    results = [by_name[model.name] for model in registered]
 
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok = True)
+    report = {"data_path": path, "test_size": test_size, "seed": seed, "test_samples": len(y_test),
+              "models": [{key: value for key, value in result.items() if key not in ["fpr", "tpr"]}
+                         for result in results]}
+    with open(report_path + ".json", "w", encoding = "utf-8") as f:
+        json.dump(json_safe(report), f, indent = 4)
+    table = pd.DataFrame([dict({"model": result["name"], "version": result["version"]},
+                               **{name: result[name] for name in metric_names}) for result in results])
+    table.to_csv(report_path + ".csv", index = False)
+    print(table.to_string(index = False))
+    if plot_path is not None:
+        roc_plot(results, plot_path)
+    return results
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Evaluate the registered models on the test set.")
+    parser.add_argument("--input", default = path, help = "Cleaned dataset, as saved by the cleaner.")
+    parser.add_argument("--models", nargs = "+", default = model_names, help = "Models to evaluate.")
+    parser.add_argument("--workers", type = int, help = "Threads evaluating the scikit-learn models.")
+    parser.add_argument("--report", default = report_path, help = "Report path, without extension.")
+    parser.add_argument("--plot", action = "store_true", help = "Save the ROC curves to " + plot_path + ".")
+    args = parser.parse_args()
+    score(args.input, args.models, args.workers, args.report, plot_path if args.plot else None)
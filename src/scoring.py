@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Scoring engine shared by the training and scoring scripts. Every model is
+run once over the test set, in batches, giving a continuous score per
+sample (the probability of death, or the SVM's decision function) and the
+predicted outcome. The metrics are then computed from one confusion matrix
+and, for ROC AUC, from the scores rather than the hard predictions.
+
+Citations:
+sklearn: Machine Learning in Python, Pedregosa et al., JMLR 12, pp. 2825-2830, 2011.
+Numpy: Harris, C.R., Millman, K.J., van der Walt, S.J. et al. Array programming with NumPy.
+            Nature 585, 357–362 (2020). DOI: 0.1038/s41586-020-2649-2
+"""
+import numpy as np
+from sklearn import metrics
+
+#Rows predicted at once
+batch_size = 65536
+#Probability above which a Keras model predicts death, as in the old classify_num
+nn_threshold = 0.5
+
+def model_outputs(model, x, batch_size = batch_size):
+    """
+    Runs a model over a dataset once.
+
+    Parameters
+    ----------
+    model : Estimator or Keras Model
+        Trained binary classifier of the outcome. Scikit-learn models (those
+        with classes_) are scored by predict_proba if they have it and 
+        decision_function otherwise; anything else is taken to output the
+        probability of death from predict, like the Neural Network. Keras
+        models of TensorFlow 2.4 have a deprecated predict_proba too, 
+        which is not used.
+    x : Pandas Dataframe or Numpy Array
+        Features.
+    batch_size : Int, optional
+        Rows predicted at once.
+
+    Returns
+    -------
+    scores : Numpy Array
+        Score of every row, higher meaning death is more likely.
+    y_pred : Numpy Array
+        Predicted outcome of every row, as model.predict would give for a
+        scikit-learn model.
+
+    """
+    x = np.asarray(x)
+    is_sklearn = hasattr(model, "classes_")
+    scores = []
+    y_pred = []
+    for start in range(0, len(x), batch_size):
+        batch = x[start:start + batch_size]
+        if is_sklearn and hasattr(model, "predict_proba"):
+            proba = model.predict_proba(batch)
+            scores.append(proba[:,1])
+            y_pred.append(model.classes_.take(np.argmax(proba, axis = 1)))
+        elif is_sklearn and hasattr(model, "decision_function"):
+            decision = model.decision_function(batch)
+            scores.append(decision)
+            y_pred.append(model.classes_.take((decision > 0).astype(int)))
+        else:
+            proba = np.asarray(model.predict(batch, batch_size = len(batch))).ravel()
+            scores.append(proba)
+            y_pred.append((proba >= nn_threshold).astype(int))
+    if not scores:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(scores), np.concatenate(y_pred)
+
+def confusion_matrix(y_true, y_pred):
+    """
+    2x2 confusion matrix of binary outcomes, rows true and columns predicted
+    (as metrics.confusion_matrix with labels [0, 1]).
+    """
+    counts = np.bincount(2 * np.asarray(y_true).astype(int) + np.asarray(y_pred).astype(int), minlength = 4)
+    return counts.reshape(2, 2)
+
+def evaluate_scores(y_true, scores, y_pred):
+    """
+    Computes the test metrics of a model from its outputs.
+
+    Parameters
+    ----------
+    y_true : Numpy Array
+        True outcomes, 1 if died.
+    scores : Numpy Array
+        Scores from model_outputs.
+    y_pred : Numpy Array
+        Predicted outcomes from model_outputs.
+
+    Returns
+    -------
+    result : Dict
+        accuracy, precision, recall and roc_auc (see registry.metric_names),
+        the confusion_matrix, and the fpr and tpr of the ROC curve.
+
+    """
+    C = confusion_matrix(y_true, y_pred)
+    (tn, fp), (fn, tp) = C
+    fpr, tpr, _ = metrics.roc_curve(y_true, scores)
+    #0 rather than undefined when nothing is predicted (or is) positive, as in sklearn
+    return {"accuracy": (tp + tn) / C.sum() if C.sum() else 0.0,
+            "precision": tp / (tp + fp) if tp + fp else 0.0,
+            "recall": tp / (tp + fn) if tp + fn else 0.0,
+            "roc_auc": metrics.auc(fpr, tpr),
+            "confusion_matrix": C, "fpr": fpr, "tpr": tpr}
+
+def evaluate_model(model, x, y_true, batch_size = batch_size):
+    """
+    Runs a model over a test set once and computes its metrics, see
+    model_outputs and evaluate_scores.
+    """
+    scores, y_pred = model_outputs(model, x, batch_size)
+    return evaluate_scores(np.asarray(y_true), scores, y_pred)
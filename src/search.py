@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Hyperparameter searches shared by the training scripts. All of them run the
+cross validation folds of every candidate in parallel, on n_jobs processes.
+
+Searches:
+    "grid": every combination of the search field (GridSearchCV).
+    "halving": successive halving over the grid (HalvingGridSearchCV). All
+        candidates are first fitted on a small sample of the training set,
+        and only the best third go on to a three times larger one, until
+        the budget of samples (the whole training set by default) is reached.
+    "random": budget candidates sampled from the grid (RandomizedSearchCV).
+
+Citations:
+sklearn: Machine Learning in Python, Pedregosa et al., JMLR 12, pp. 2825-2830, 2011.
+"""
+from sklearn import model_selection
+#Needed to use the halving searches
+from sklearn.experimental import enable_halving_search_cv
+
+searches = ["grid", "halving", "random"]
+#Candidates of a random search if no budget is given
+default_candidates = 50
+
+def make_search(estimator, search_field, search = "grid", budget = None, n_jobs = -1,
+                scoring = None, verbose = 2, random_state = 0):
+    """
+    Builds an unfitted hyperparameter search.
+
+    Parameters
+    ----------
+    estimator : Estimator
+        Model to tune.
+    search_field : Dict
+        Values to search for every hyperparameter.
+    search : String, optional
+        One of searches, "grid" by default.
+    budget : Int, optional
+        For "random", the number of candidates (default_candidates by
+        default). For "halving", the most training samples any candidate is
+        fitted on (all of them by default). Not used by "grid".
+    n_jobs : Int, optional
+        Number of processes, all cores (-1) by default.
+    scoring : String, optional
+        Metric to rank the candidates by, the estimator's score by default.
+    verbose : Int, optional
+        Verbosity of the search.
+    random_state : Int, optional
+        Seed of the sampling of the halving and random searches.
+
+    Returns
+    -------
+    model : Search
+        Search with fit, best_params_, best_score_ and best_estimator_.
+
+    """
+    if search == "grid":
+        return model_selection.GridSearchCV(estimator, search_field, scoring = scoring,
+                                            n_jobs = n_jobs, verbose = verbose)
+    elif search == "halving":
+        max_resources = "auto" if budget is None else budget
+        return model_selection.HalvingGridSearchCV(estimator, search_field, scoring = scoring,
+                                                   max_resources = max_resources, n_jobs = n_jobs,
+                                                   verbose = verbose, random_state = random_state)
+    elif search == "random":
+        n_iter = default_candidates if budget is None else budget
+        return model_selection.RandomizedSearchCV(estimator, search_field, n_iter = n_iter,
+                                                  scoring = scoring, n_jobs = n_jobs,
+                                                  verbose = verbose, random_state = random_state)
+    raise ValueError("Search must be grid, halving or random")
+
+def report_search(name, model):
+    """
+    Prints the best hyperparameters found by a fitted search, and their
+    cross validation score.
+    """
+    print("Best " + name + ":", model.best_params_, "with a cross validation score of",
+          model.best_score_)
+    return
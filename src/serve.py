@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP service scoring the mortality risk of new patients. The latest
+registered version of each model (see src/registry.py) and the
+normalization bounds it was trained with are loaded once, when the service
+starts. Every request's raw records are encoded by the online Preprocessor
+(see src/preprocess.py), and the rows of all requests arriving within
+max_latency seconds of each other are scored together by every model, as
+one micro-batch of at most max_batch_size rows.
+
+    python -m src.serve --port 8000 --max-latency 0.005
+
+    POST /predict   {"records": [{"age": "50-59", "sex": "male", ...}, ...]}
+                    or a single record. Answers
+                    {"predictions": [{"rf": {"probability": 0.12, "score": 0.12,
+                                             "prediction": 0}, ...}, ...]},
+                    one entry per record. probability is null for models
+                    without one (the SVM); score is then its decision function.
+    GET /health     Names and versions of the loaded models.
+
+Only the Python standard library is used for serving, and the service binds
+to 127.0.0.1 by default.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from src.clean_covid_dataset import save_path
+from src.preprocess import Preprocessor
+from src.registry import load_model, list_versions, common_bounds, model_names, registry_dir
+from src.scoring import model_outputs
+
+host = "127.0.0.1"
+port = 8000
+#Most rows scored at once
+max_batch_size = 256
+#Seconds the first row of a micro-batch waits for others to join it
+max_latency = 0.005
+#Largest request body read, in bytes
+max_body = 1 << 20
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch_size = max_batch_size, max_latency = max_latency):
+        """
+        Coalesces rows submitted from many threads into batches, scored by
+        one worker thread.
+
+        Parameters
+        ----------
+        predict : Callable
+            Takes a 2D Numpy Array of rows and returns a list with the
+            result of every row.
+        max_batch_size : Int, optional
+            Most rows in a batch.
+        max_latency : Float, optional
+            Seconds a batch waits for more rows after its first one arrives.
+
+        """
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.__queue = queue.Queue()
+        self.__worker = threading.Thread(target = self.__run, daemon = True)
+        self.__worker.start()
+
+    def submit(self, row):
+        """
+        Queues one row, returning a Future of its result.
+        """
+        future = Future()
+        self.__queue.put((row, future))
+        return future
+
+    def close(self):
+        """
+        Scores the rows already queued and stops the worker.
+        """
+        self.__queue.put(None)
+        self.__worker.join()
+        return
+
+    def __run(self):
+        closing = False
+        while not closing:
+            item = self.__queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.__queue.get(timeout = remaining) if remaining > 0 else self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            rows = np.stack([row for row, future in batch])
+            try:
+                results = self.predict(rows)
+            except Exception as e:
+                for row, future in batch:
+                    future.set_exception(e)
+                continue
+            for (row, future), result in zip(batch, results):
+                future.set_result(result)
+        return
+
+class RiskService:
+    def __init__(self, names = model_names, clean_path = save_path, registry = registry_dir,
+                 max_batch_size = max_batch_size, max_latency = max_latency):
+        """
+        The models, the preprocessing and the micro-batching of the service.
+
+        Parameters
+        ----------
+        names : List of Strings, optional
+            Models to serve. Those never registered are skipped.
+        clean_path : String, optional
+            Cleaned dataset whose saved bounds are used if no model has them.
+        registry : String, optional
+            Directory of the model registry.
+        max_batch_size : Int, optional
+            Most rows scored at once.
+        max_latency : Float, optional
+            Seconds a micro-batch waits for more rows.
+
+        """
+        self.registered = [load_model(name, registry = registry) for name in names
+                           if list_versions(name, registry)]
+        if not self.registered:
+            raise FileNotFoundError("None of " + ", ".join(names) + " are saved in " + registry)
+        #Read every model now, rather than on the first request
+        self.models = {registered.name: registered.model for registered in self.registered}
+        self.preprocessor = Preprocessor(clean_path, bounds = common_bounds(self.registered))
+        self.batcher = MicroBatcher(self.predict, max_batch_size, max_latency)
+
+    def predict(self, x):
+        """
+        Scores a batch of preprocessed rows with every model.
+
+        Parameters
+        ----------
+        x : Numpy Array
+            Rows from Preprocessor.transform_record.
+
+        Returns
+        -------
+        results : List of Dicts
+            For every row and model, the probability of death (None if the
+            model has no probabilities), its score (see model_outputs) and
+            the predicted outcome.
+
+        """
+        results = [{} for row in x]
+        for name, model in self.models.items():
+            scores, y_pred = model_outputs(model, x, batch_size = len(x))
+            has_probability = hasattr(model, "predict_proba") or not hasattr(model, "decision_function")
+            for result, score, prediction in zip(results, scores.tolist(), y_pred.tolist()):
+                result[name] = {"probability": score if has_probability else None,
+                                "score": score, "prediction": int(prediction)}
+        return results
+
+    def score_records(self, records):
+        """
+        Preprocesses raw patient records and scores them in the next
+        micro-batches, alongside the records of any other request.
+
+        Parameters
+        ----------
+        records : List of Dicts
+            Fields of the line-list (see record_columns).
+
+        Returns
+        -------
+        results : List of Dicts
+            Result of every record, see predict.
+
+        """
+        rows = [self.preprocessor.transform_record(record) for record in records]
+        futures = [self.batcher.submit(row) for row in rows]
+        return [future.result() for future in futures]
+
+    def health(self):
+        return {"models": [{"name": registered.name, "version": registered.version}
+                           for registered in self.registered]}
+
+    def close(self):
+        self.batcher.close()
+        return
+
+class RequestHandler(BaseHTTPRequestHandler):
+    #Set by make_server
+    service = None
+
+    def __send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.__send_json(200, self.service.health())
+        else:
+            self.__send_json(404, {"error": "Not found"})
+        return
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.__send_json(404, {"error": "Not found"})
+            return
+        if "Content-Length" not in self.headers:
+            self.__send_json(411, {"error": "Content-Length is required"})
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.__send_json(400, {"error": "Content-Length must be a whole number of bytes"})
+            return
+        if length > max_body:
+            self.__send_json(413, {"error": "Request body is too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            records = body["records"] if isinstance(body, dict) and "records" in body else [body]
+            if not all(isinstance(record, dict) for record in records):
+                raise ValueError("Records must be JSON objects")
+            predictions = self.service.score_records(records)
+        except (ValueError, TypeError) as e:
+            #Includes invalid JSON and records the preprocessor rejects
+            self.__send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            #Anything else failed in the batcher or a model, so answer rather than drop the connection
+            self.__send_json(500, {"error": repr(e)})
+            return
+        self.__send_json(200, {"predictions": predictions})
+        return
+
+    def log_message(self, format, *args):
+        #Only errors are logged, not every request
+        return
+
+def make_server(service, host = host, port = port):
+    """
+    HTTP server answering every request on its own thread with service.
+    Port 0 picks a free port, see server.server_address.
+    """
+    handler = type("ServiceHandler", (RequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve the registered models over HTTP.")
+    parser.add_argument("--host", default = host, help = "Address to listen on.")
+    parser.add_argument("--port", type = int, default = port, help = "Port to listen on.")
+    parser.add_argument("--models", nargs = "+", default = model_names, help = "Models to serve.")
+    parser.add_argument("--max-batch", type = int, default = max_batch_size, help = "Most rows scored at once.")
+    parser.add_argument("--max-latency", type = float, default = max_latency,
+                        help = "Seconds a micro-batch waits for more rows.")
+    args = parser.parse_args()
+    service = RiskService(args.models, max_batch_size = args.max_batch, max_latency = args.max_latency)
+    server = make_server(service, args.host, args.port)
+    print("Serving " + ", ".join(service.models) + " on http://" + args.host + ":" + str(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
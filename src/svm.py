@@ -2,7 +2,10 @@
 """
 Code to train, evaluate and save the SVM trained on the cleaned datset. 
 Use the cleaned dataset (from CV19_data_cleaner.py). If you want to run a gridsearch,
-set the grid search bool to true
+set the grid search bool to true. An exact RBF SVC scales quadratically or worse with 
+the number of samples, so for the full training set set svm_mode to "nystroem" (an 
+approximate RBF kernel with a linear SVM) or "subsample" (an exact SVC on a stratified
+sample of the training set).
 
 Citations:
 Pandas:  McKinney, Proceedings of the 9th Python in Science Conference, Volume 445, 2010.
@@ -13,49 +16,78 @@ Numpy: Harris, C.R., Millman, K.J., van der Walt, S.J. et al. Array programming
             Nature 585, 357–362 (2020). DOI: 0.1038/s41586-020-2649-2
 """
 import numpy as np
-from sklearn import metrics, model_selection, svm
-import pandas as pd
-from imblearn.combine import SMOTEENN
-import pickle
+from sklearn import model_selection, svm
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
+from src.resample import resampled_split
+from src.registry import save_model, metric_names
+from src.search import make_search, report_search
+from src.scoring import evaluate_model
 #Set
-path = "build\\cleandata.csv"
+path = "build\\cleandata.csv" #Or .parquet, .feather or .npy, as saved by the cleaner
 grid_search = True
-def train_and_save(path, grid_search):
-    data = pd.read_csv(path)
-    y = data.pop('outcome')
-    x_train, x_test, y_train, y_test = model_selection.train_test_split(data, y, test_size=0.33, random_state = 0)
-    x_train, y_train =  SMOTEENN().fit_resample(x_train, y_train)
+svm_mode = "exact" #Or "nystroem" or "subsample" for large training sets
+n_components = 500 #Size of the approximate kernel features for nystroem
+subsample_size = 20000 #Training samples for subsample
+search = "grid" #Or "halving" or "random", see src/search.py
+search_budget = None
+n_jobs = -1 #All cores
+
+def make_svm(svm_mode, C, gamma):
+    """
+    Builds an unfitted RBF SVM.
+
+    Parameters
+    ----------
+    svm_mode : String
+        "exact" or "subsample" for an SVC, "nystroem" for a linear SVM on 
+        n_components Nystroem features approximating the RBF kernel.
+    C : Float
+        Regularization parameter.
+    gamma : Float
+        RBF kernel coefficient.
+
+    Returns
+    -------
+    model_svm : Estimator
+        The SVM.
+    search_names : Dict
+        Name of C and gamma in the estimator's parameters, for searches.
+
+    """
+    if svm_mode in ["exact", "subsample"]:
+        return svm.SVC(C = C, gamma = gamma), {"C": "C", "gamma": "gamma"}
+    elif svm_mode == "nystroem":
+        model_svm = Pipeline([("kernel", Nystroem(gamma = gamma, n_components = n_components, random_state = 0)),
+                              ("svm", svm.LinearSVC(C = C, dual = False))])
+        return model_svm, {"C": "svm__C", "gamma": "kernel__gamma"}
+    raise ValueError("SVM mode must be exact, nystroem or subsample")
+
+def train_and_save(path, grid_search, svm_mode = svm_mode):
+    x_train, x_test, y_train, y_test = resampled_split(path)
+    if svm_mode == "subsample" and len(x_train) > subsample_size:
+        x_train, _, y_train, _ = model_selection.train_test_split(x_train, y_train, train_size = subsample_size,
+                                                                  stratify = y_train, random_state = 0)
+    model_svm, search_names = make_svm(svm_mode, C = 1000, gamma = 1000)
     if grid_search:
         C_space = np.logspace(-3, 3, 5)
         gamma_space = np.logspace(-3, 3, 5)
-        search_field = dict(gamma=gamma_space, C=C_space)
-        model_svm = svm.SVC(C = 1000, gamma = 1000)
-        model = model_selection.GridSearchCV(model_svm, search_field, verbose = 2)
-        model = model_svm.fit(x_train,y_train)
-        list1 = []
-        list1.append(metrics.accuracy_score(y_test,model.predict(x_test)))
-        list1.append(metrics.precision_score(y_test,model.predict(x_test)))
-        list1.append(metrics.recall_score(y_test,model.predict(x_test)))
-        list1.append(metrics.roc_auc_score(y_test,model.predict(x_test)))
-        with open('holder.txt','w') as f:
-            f.write(str(list1))
-        ##Uncomment to see the parameters which achieved the best accuracy
-        # print((model.best_params_, model.best_score_))
+        search_field = {search_names["gamma"]: gamma_space, search_names["C"]: C_space}
+        model = make_search(model_svm, search_field, search, search_budget, n_jobs)
+        model = model.fit(x_train,y_train)
+        report_search("SVM", model)
     else:
-        model_svm = svm.SVC(C = 1000, gamma = 1000)
         model = model_svm.fit(x_train,y_train)
-        list1 = []
-        list1.append(metrics.accuracy_score(y_test,model.predict(x_test)))
-        list1.append(metrics.precision_score(y_test,model.predict(x_test)))
-        list1.append(metrics.recall_score(y_test,model.predict(x_test)))
-        list1.append(metrics.roc_auc_score(y_test,model.predict(x_test)))
-        print(list1)  
-    file_model = "cv19_svm.pkl"
-    with open(file_model, 'wb') as file:
-        pickle.dump(model, file)
+    result = evaluate_model(model, x_test, y_test)
+    list1 = [result[name] for name in metric_names]
+    print(list1)
+    scores = dict(zip(metric_names, list1))
+    if grid_search:
+        scores["cv_accuracy"] = model.best_score_
+        model = model.best_estimator_
+    save_model(model, "svm", "sklearn", path, metrics = scores,
+               hyperparameters = dict(model.get_params(deep = True), svm_mode = svm_mode))
     return
 
-train_and_save(path,grid_search)
-
-
-
+if __name__ == "__main__":
+    train_and_save(path,grid_search)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Fake cleaned dataset and registered models, shared by the tests of the
+scripts which score the registered models
+"""
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from sklearn import svm
+from sklearn.ensemble import RandomForestClassifier
+from src.clean_covid_dataset import clean_columns, feature_columns, save_bounds, bounds_path
+from src.registry import save_model
+
+def register_fake_models(registry, data_path):
+    """
+    Saves 200 random cleaned rows to data_path, with bounds of 0 to 100, and
+    registers a Random Forest (as rf) and an SVM (as svm) trained on them.
+
+    Returns
+    -------
+    rf, svm : Estimators
+        The registered models.
+
+    """
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame(rng.rand(200, len(feature_columns)), columns = feature_columns)
+    data["outcome"] = (data["age"] + 0.3 * rng.rand(200) > 0.6).astype(float)
+    data.to_csv(data_path, index = False)
+    save_bounds(bounds_path(data_path), (np.zeros(len(clean_columns)), np.full(len(clean_columns), 100.0)))
+    x = data.loc[:,feature_columns].values
+    model_rf = RandomForestClassifier(n_estimators = 5, random_state = 0).fit(x, data["outcome"])
+    model_svm = svm.SVC().fit(x, data["outcome"])
+    save_model(model_rf, "rf", "sklearn", data_path, registry = registry)
+    save_model(model_svm, "svm", "sklearn", data_path, registry = registry)
+    return model_rf, model_svm
+
+def remove_fake_models(registry, data_path):
+    """
+    Deletes what register_fake_models saved.
+    """
+    shutil.rmtree(registry, ignore_errors = True)
+    for file in [data_path, bounds_path(data_path)]:
+        if os.path.isfile(file):
+            os.remove(file)
+    return
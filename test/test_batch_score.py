@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the batch scoring of a line-list
+"""
+import os
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from src.preprocess import Preprocessor
+from src.batch_score import score_file
+from test.fake_models import register_fake_models, remove_fake_models
+
+class TestBatchScore(unittest.TestCase):
+    def setUp(self):
+        self.registry = ".\\test\\models"
+        self.data_path = ".\\test\\batch_fake_data.csv"
+        self.input_path = ".\\test\\batch_fake_linelist.csv"
+        self.output_path = ".\\test\\batch_predictions.csv"
+        self.rf, self.svm = register_fake_models(self.registry, self.data_path)
+        rng = np.random.RandomState(1)
+        ages = ["50-59", "15", "80", np.nan]
+        symptoms = ["cough, acute respiratory failure", "headache", np.nan, "fever"]
+        chronic = [np.nan, "COPD", "hypertension, diabetes", "asthma"]
+        n = 101
+        self.linelist = pd.DataFrame({"ID": ["p" + str(i) for i in range(n)],
+                                      "age": [ages[i % 4] for i in range(n)],
+                                      "sex": [["male", "female", np.nan][i % 3] for i in range(n)],
+                                      "latitude": rng.rand(n) * 90,
+                                      "longitude": rng.rand(n) * 180,
+                                      "date_onset_symptoms": ["2" + str(i % 8) + ".01.2020" for i in range(n)],
+                                      "date_admission_hospital": [np.nan] * n,
+                                      "symptoms": [symptoms[i % 4] for i in range(n)],
+                                      "chronic_disease": [chronic[i % 4] for i in range(n)],
+                                      "country": ["China"] * n})
+        self.linelist.to_csv(self.input_path, index = False)
+
+    def tearDown(self):
+        remove_fake_models(self.registry, self.data_path)
+        for file in [self.input_path, self.output_path]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_score_file_success(self):
+        n_rows, n_failed = score_file(self.input_path, self.output_path, ["rf", "svm", "nn"], chunksize = 10,
+                                      queue_size = 1, clean_path = self.data_path, registry = self.registry)
+        self.assertEqual((n_rows, n_failed), (101, 0))
+        actual = pd.read_csv(self.output_path)
+        self.assertEqual(list(actual.columns), ["ID", "rf_score", "rf_prediction", "svm_score", "svm_prediction",
+                                                "error"])
+        self.assertEqual(list(actual["ID"]), list(self.linelist["ID"]))
+        self.assertTrue(actual["error"].isna().all())
+        x = Preprocessor(self.data_path).transform_batch(self.linelist)
+        np.testing.assert_allclose(actual["rf_score"], self.rf.predict_proba(x)[:,1])
+        np.testing.assert_array_equal(actual["svm_prediction"], self.svm.predict(x))
+        self.assertEqual([file for file in os.listdir(".") if file.endswith(".csv.tmp")], [])
+
+    def test_score_file_batched(self):
+        #A valid file is encoded a chunk at a time, never a record at a time
+        with mock.patch.object(Preprocessor, "transform_batch", autospec = True,
+                               side_effect = Preprocessor.transform_batch) as transform_batch, \
+             mock.patch.object(Preprocessor, "transform_record",
+                               side_effect = AssertionError("Encoded a record on its own")):
+            n_rows, n_failed = score_file(self.input_path, self.output_path, ["rf"], chunksize = 10,
+                                          queue_size = 1, clean_path = self.data_path, registry = self.registry)
+        self.assertEqual((n_rows, n_failed), (101, 0))
+        self.assertEqual(transform_batch.call_count, 11)
+
+    def test_score_file_invalid(self):
+        #Values the raw line-list has which the cleaner can not encode
+        invalid = {3: ("sex", "unknown"), 57: ("age", "30-39"),
+                   58: ("date_admission_hospital", "20.02.2020 - 23.02.2020"),
+                   100: ("symptoms", "loss of smell")}
+        for row, (column, value) in invalid.items():
+            self.linelist.loc[row, column] = value
+        self.linelist.to_csv(self.input_path, index = False)
+        n_rows, n_failed = score_file(self.input_path, self.output_path, ["rf"], chunksize = 10, queue_size = 1,
+                                      clean_path = self.data_path, registry = self.registry)
+        self.assertEqual((n_rows, n_failed), (101, 4))
+        actual = pd.read_csv(self.output_path)
+        failed = actual["error"].notna().values
+        self.assertEqual(list(np.flatnonzero(failed)), sorted(invalid))
+        self.assertTrue(actual.loc[failed, "rf_score"].isna().all())
+        self.assertTrue(actual.loc[failed, "rf_prediction"].isna().all())
+        x = Preprocessor(self.data_path).transform_batch(self.linelist[~failed])
+        np.testing.assert_allclose(actual.loc[~failed, "rf_score"], self.rf.predict_proba(x)[:,1], rtol = 1e-6)
+
+    def test_score_file_missing(self):
+        #A failed run leaves no output behind
+        with self.assertRaises(FileNotFoundError):
+            score_file(".\\test\\missing_linelist.csv", self.output_path, ["rf"],
+                       clean_path = self.data_path, registry = self.registry)
+        self.assertFalse(os.path.isfile(self.output_path))
+        self.assertEqual([file for file in os.listdir(".") if file.endswith(".csv.tmp")], [])
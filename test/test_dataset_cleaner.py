@@ -7,11 +7,16 @@ Muller, David. "How To Use unittest to Write a Test Case for a Function in Pytho
     how-to-use-unittest-to-write-a-test-case-for-a-function-in-python. 
     
 """
+import json
 import os
+import shutil
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
 import numpy as np
 import pandas as pd
-from src.clean_covid_dataset import Dataset
+from src.clean_covid_dataset import (Dataset, load_vocabulary, vocabulary_path, load_bounds, load_clean, main,
+                                     age_ranges)
 
 class TestDataset(unittest.TestCase):
     def setUp(self):
@@ -24,6 +29,48 @@ class TestDataset(unittest.TestCase):
         file_exist = os.path.isfile(".\\test\\clean_fake_data.csv")
         if file_exist:
             os.remove(".\\test\\clean_fake_data.csv")
+        for file in [".\\test\\clean_fake_data_bounds.json", ".\\test\\clean_fake_data.npy", 
+                     ".\\test\\clean_fake_data_labels.npy"]:
+            if os.path.isfile(file):
+                os.remove(file)
+        
+    def test_read_data_columns(self):
+        actual = self.dataset_cleaner._Dataset__read_data(".\\test\\fake_data.csv")
+        self.assertEqual(list(actual.columns), ["age", "sex", "latitude", "longitude",
+                              "date_onset_symptoms", "date_admission_hospital", 
+                              "symptoms", "chronic_disease", "date_death_or_discharge", 
+                              "outcome", "admin1"])
+        self.assertEqual(actual["sex"].dtype, object)
+        self.assertEqual(actual["outcome"].dtype, object)
+        self.assertEqual(actual["latitude"].dtype, np.float32)
+        self.assertEqual(actual["longitude"].dtype, np.float32)
+        
+    def test_dataset_lazy_read(self):
+        #Making a Dataset must not read the line-list
+        lazy_cleaner = Dataset(".\\test\\missing_data.csv", ".\\test\\clean_fake_data.csv")
+        with self.assertRaises(FileNotFoundError):
+            lazy_cleaner.data_pc
+        self.assertEqual(list(self.dataset_cleaner.data_pc.columns)[0], "age")
+        
+    def test_main_format_success(self):
+        test_case = {"age": ["10", "15"], 
+                     "sex": ["male", "female"], 
+                     "latitude": [1.1, 2.2], 
+                     "longitude": [1.3, 2.6],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019"],
+                     "symptoms": ["cough", "headache"], 
+                     "chronic_disease": [np.nan, "COPD"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019"], 
+                     "outcome": ["death","discharged"], 
+                     "admin1": ["True","False"]}
+        pd.DataFrame(data = test_case).to_csv(".\\test\\cli_fake_data.csv", index = False)
+        self.addCleanup(os.remove, ".\\test\\cli_fake_data.csv")
+        main(["--input", ".\\test\\cli_fake_data.csv", "--output", ".\\test\\clean_fake_data.csv",
+              "--format", "npy", "--workers", "2", "--cache-dir", "none"])
+        actual = load_clean(".\\test\\clean_fake_data.npy")
+        self.assertEqual(list(actual["outcome"]), [1, 0])
+        self.assertFalse(os.path.isfile(".\\test\\clean_fake_data.csv"))
         
     def test_remove_no_outcome_success(self):
         test_case = {"age": ["10", "15", "20"], 
@@ -160,12 +207,38 @@ class TestDataset(unittest.TestCase):
                                   "date_onset_symptoms", "date_admission_hospital", 
                                   "symptoms", "chronic_disease", "date_death_or_discharge_days", 
                                   "outcome"])
-        expected = preclean_data1.reset_index(drop = True)
+        expected = preclean_data1.astype({"date_death_or_discharge_days": np.int16}).reset_index(drop = True)
         #Should raise error
         pd.testing.assert_frame_equal(actual, expected)
         #If above does not raise error, means they are equivalent. Hence Assert True
         self.assertEqual(1,1)
 
+    def test_convert_dates_all_typos(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", "male", "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["-11.01.2020", "24.03.2020 - 26.03.2020", np.nan], 
+                     "date_admission_hospital": ["11.01.2020", np.nan, "25.02.2020"], 
+                     "symptoms": ["cough, respiratory distress", "headache", "fever"], 
+                     "chronic_disease": ["diabetes", "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["11.01.2020", "03.22.2020", "25.02.2020"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        actual = self.dataset_cleaner._Dataset__convert_dates(preclean_data).reset_index(drop = True)
+        self.assertEqual(list(actual.columns), ["age", "sex", "latitude", "longitude",
+                              "date_onset_symptoms_days", "date_admission_hospital_days", 
+                              "symptoms", "chronic_disease", "date_death_or_discharge_days", 
+                              "outcome"])
+        self.assertEqual(list(actual["date_onset_symptoms_days"]), [375, 448, -1])
+        self.assertEqual(list(actual["date_admission_hospital_days"]), [375, -1, 420])
+        self.assertEqual(list(actual["date_death_or_discharge_days"]), [375, 446, 420])
+        self.assertEqual(actual["date_onset_symptoms_days"].dtype, np.int16)
+        
     def test_convert_dates_exception(self):
         test_case = {"age": ["10", "15", "20"], 
                      "sex": ["male", "male", "female"], 
@@ -341,6 +414,25 @@ class TestDataset(unittest.TestCase):
         #If above does not raise error, means they are equivalent. Hence Assert True
         self.assertEqual(1,1)
     
+    def test_symptom_encoder_outlier(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", "male", "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["11.01.20", "24.03.20", "25.02.20"], 
+                     "date_admission_hospital": ["11.01.20", "24.03.20", "25.02.20"], 
+                     "symptoms": ["obnubilation", "anorexia: transient fatigue", "Mild to moderate; dry cough"], 
+                     "chronic_disease": ["diabetes", "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["11.01.20", "24.03.20", "25.02.20"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        actual = self.dataset_cleaner._Dataset__symptom_standardize(preclean_data).reset_index(drop = True)
+        self.assertEqual(list(actual["symptoms"]), [-1, 1, 2])
+    
     def test_symptom_encoder_exception(self):
         test_case = {"age": ["10", "15", "20"], 
                      "sex": ["male", "male", "female"], 
@@ -385,7 +477,7 @@ class TestDataset(unittest.TestCase):
                      "date_onset_symptoms": ["11.01.20", "24.03.20", "25.02.20"], 
                      "date_admission_hospital": ["11.01.20", "24.03.20", "25.02.20"], 
                      "symptoms": ["cough, acute respiratory distress", "headache", "hypoxia"],
-                     "chronic_disease": [[0,0,0,1], [0,1,0,0], [0,0,1,0]],        
+                     "chronic_disease": ["diabetes", "COPD", "hypertension"],        
                      "date_death_or_discharge": ["11.01.20", "24.03.20", "25.02.20"], 
                      "outcome": ["death","discharged","discharged"], 
                      "admin1": ["True","False","False"],
@@ -399,7 +491,8 @@ class TestDataset(unittest.TestCase):
                               "date_death_or_discharge", "outcome", "admin1", 
                               "Other Underlying", "Severe Underlying", 
                               "hypertension", "diabetes"])
-        expected = preclean_data1.reset_index(drop = True)
+        expected = preclean_data1.astype({"Other Underlying": np.int8, "Severe Underlying": np.int8,
+                                          "hypertension": np.int8, "diabetes": np.int8}).reset_index(drop = True)
         #Should raise error
         pd.testing.assert_frame_equal(actual, expected)
         #If above does not raise error, means they are equivalent. Hence Assert True
@@ -429,7 +522,7 @@ class TestDataset(unittest.TestCase):
                      "date_onset_symptoms": ["11.01.20", "24.03.20", "25.02.20"], 
                      "date_admission_hospital": ["11.01.20", "24.03.20", "25.02.20"], 
                      "symptoms": ["cough, acute respiratory distress", "headache", "hypoxia"],
-                     "chronic_disease": [[-1,-1,-1,-1], [0,1,0,0], [0,0,1,0]],        
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
                      "date_death_or_discharge": ["11.01.20", "24.03.20", "25.02.20"], 
                      "outcome": ["death","discharged","discharged"], 
                      "admin1": ["True","False","False"],
@@ -443,7 +536,8 @@ class TestDataset(unittest.TestCase):
                               "date_death_or_discharge", "outcome", "admin1", 
                               "Other Underlying", "Severe Underlying", 
                               "hypertension", "diabetes"])
-        expected = preclean_data1.reset_index(drop = True)
+        expected = preclean_data1.astype({"Other Underlying": np.int8, "Severe Underlying": np.int8,
+                                          "hypertension": np.int8, "diabetes": np.int8}).reset_index(drop = True)
         #Should raise error
         pd.testing.assert_frame_equal(actual, expected)
         #If above does not raise error, means they are equivalent. Hence Assert True
@@ -473,7 +567,7 @@ class TestDataset(unittest.TestCase):
                      "date_onset_symptoms": ["11.01.20", "24.03.20", "25.02.20"], 
                      "date_admission_hospital": ["11.01.20", "24.03.20", "25.02.20"], 
                      "symptoms": ["cough, acute respiratory distress", "headache", "hypoxia"],
-                     "chronic_disease": [[-1,-1,-1,-1], [0,1,0,0], [0,0,1,0]],        
+                     "chronic_disease": [1, "COPD", "hypertension"],        
                      "date_death_or_discharge": ["11.01.20", "24.03.20", "25.02.20"], 
                      "outcome": ["death","discharged","discharged"], 
                      "admin1": ["True","False","False"],
@@ -487,12 +581,32 @@ class TestDataset(unittest.TestCase):
                               "date_death_or_discharge", "outcome", "admin1", 
                               "Other Underlying", "Severe Underlying", 
                               "hypertension", "diabetes"])
-        expected = preclean_data1.reset_index(drop = True)
+        expected = preclean_data1.astype({"Other Underlying": np.int8, "Severe Underlying": np.int8,
+                                          "hypertension": np.int8, "diabetes": np.int8}).reset_index(drop = True)
         #Should raise error
         pd.testing.assert_frame_equal(actual, expected)
         #If above does not raise error, means they are equivalent. Hence Assert True
         self.assertEqual(1,1)
 
+    def test_chronic_disease_encoder_vocabulary(self):
+        with open(vocabulary_path) as f:
+            raw = json.load(f)
+        raw["version"] = raw["version"] + 1
+        raw["chronic_disease"]["severe_underlying"].append("obesity")
+        with open(".\\test\\vocabulary.json", "w") as f:
+            json.dump(raw, f)
+        vocabulary = load_vocabulary(".\\test\\vocabulary.json")
+        os.remove(".\\test\\vocabulary.json")
+        self.dataset_cleaner.vocabulary = vocabulary
+        test_case = {"chronic_disease": ["obesity", "obesity: diabetes", "gout"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["chronic_disease"])
+        actual = self.dataset_cleaner._Dataset__chronic_disease_standardize(preclean_data)
+        self.assertEqual(list(actual["Severe Underlying"]), [1, 1, 0])
+        self.assertEqual(list(actual["Other Underlying"]), [0, 0, 1])
+        self.assertEqual(list(actual["diabetes"]), [0, 1, 0])
+        with self.assertRaises(TypeError):
+            vocabulary["chronic_synonyms"]["gout"] = "diabetes"
+        
     def test_outcome_standardize_success(self):
         test_case = {"age": ["10", "15", "20"], 
                      "sex_encoded": ["male", "male", "female"], 
@@ -668,7 +782,33 @@ class TestDataset(unittest.TestCase):
         pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
         #If above does not raise error, means they are equivalent. Hence Assert True
         self.assertEqual(1,1)
-        
+
+    def test_clean_and_save_read_success(self):
+        test_case = {"age": ["10", "15", "20"],
+                     "sex": ["male", np.nan, "female"],
+                     "latitude": [1.1, 2.2, 3.3],
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan],
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "outcome": ["death","discharged","discharged"],
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude",
+                              "longitude", "date_onset_symptoms",
+                              "date_admission_hospital", "symptoms", "chronic_disease",
+                              "date_death_or_discharge", "outcome", "admin1"])
+        preclean_data.to_csv(".\\test\\read_fake_data.csv", index = False)
+        self.addCleanup(os.remove, ".\\test\\read_fake_data.csv")
+        self.dataset_cleaner.data_pc = preclean_data
+        expected = self.dataset_cleaner.clean_and_save().reset_index(drop = True)
+        #Cleaning the frame __read_data gives must match cleaning it in memory
+        read_cleaner = Dataset(".\\test\\read_fake_data.csv", ".\\test\\clean_fake_data.csv")
+        read_cleaner.data_pc = read_cleaner._Dataset__read_data(".\\test\\read_fake_data.csv")
+        actual = read_cleaner.clean_and_save().reset_index(drop = True)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
+
     def test_clean_and_save_checkSave_success(self):
         test_case = {"age": ["10", "15", "20"], 
                      "sex": ["male", np.nan, "female"], 
@@ -694,6 +834,254 @@ class TestDataset(unittest.TestCase):
             raise Exception("File has not been saved")
             self.assertEqual(0,1)
             
+    def test_clean_and_save_chunked_success(self):
+        test_case = {"age": ["10", "15", "20", "30"], 
+                     "sex": ["male", np.nan, "female", "male"], 
+                     "latitude": [1.1, 2.2, 3.3, 4.4], 
+                     "longitude": [1.3, 2.6, 1.3, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan, "fever"], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension", np.nan],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan], 
+                     "outcome": ["death","discharged","discharged", np.nan], 
+                     "admin1": ["True","False","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        preclean_data.to_csv(".\\test\\chunk_fake_data.csv", index = False)
+        self.addCleanup(os.remove, ".\\test\\chunk_fake_data.csv")
+        chunked_cleaner = Dataset(".\\test\\chunk_fake_data.csv", ".\\test\\clean_fake_data.csv", chunksize = 2)
+        chunked_cleaner.clean_and_save()
+        actual = pd.read_csv(".\\test\\clean_fake_data.csv")
+        self.dataset_cleaner.data_pc = preclean_data.iloc[:3]
+        expected = self.dataset_cleaner.clean_and_save().reset_index(drop = True)
+        #Should raise error
+        pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
+        #If above does not raise error, means they are equivalent. Hence Assert True
+        self.assertEqual(1,1)
+        
+    def test_clean_and_save_parallel_success(self):
+        test_case = {"age": ["10", "15", "20", "30"], 
+                     "sex": ["male", np.nan, "female", "male"], 
+                     "latitude": [1.1, 2.2, 3.3, 4.4], 
+                     "longitude": [1.3, 2.6, 1.3, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan, "fever"], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension", np.nan],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan], 
+                     "outcome": ["death","discharged","discharged", "death"], 
+                     "admin1": ["True","False","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        self.dataset_cleaner.data_pc = preclean_data
+        expected = self.dataset_cleaner.clean_and_save()
+        self.dataset_cleaner.workers = 3
+        self.dataset_cleaner.data_pc = preclean_data
+        actual = self.dataset_cleaner.clean_and_save()
+        #Should raise error
+        pd.testing.assert_frame_equal(actual, expected, check_exact = True)
+        #If above does not raise error, means they are equivalent. Hence Assert True
+        self.assertEqual(1,1)
+        
+    def test_clean_and_save_parallel_modes(self):
+        test_case = {"age": ["10", "15", "20", "30", "40"], 
+                     "sex": ["male", np.nan, "female", "male", "female"], 
+                     "latitude": [1.1, 2.2, 3.3, 4.4, 5.5], 
+                     "longitude": [1.3, 2.6, 1.3, 1.3, 2.6],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan, "01.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan, np.nan],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan, "fever", "cough"], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension", np.nan, "diabetes"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan, np.nan], 
+                     "outcome": ["death","discharged","discharged", "death", "discharged"], 
+                     "admin1": ["True","False","False","False","True"]}
+        pd.DataFrame(data = test_case).to_csv(".\\test\\parallel_fake_data.csv", index = False)
+        self.addCleanup(os.remove, ".\\test\\parallel_fake_data.csv")
+        self.addCleanup(shutil.rmtree, ".\\test\\checkpoints", ignore_errors = True)
+        expected = Dataset(".\\test\\parallel_fake_data.csv", ".\\test\\clean_fake_data.csv").clean_and_save()
+        #Streamed or checkpointed, the rows are still cleaned on the workers
+        with mock.patch("src.clean_covid_dataset.ProcessPoolExecutor", wraps = ProcessPoolExecutor) as pool:
+            Dataset(".\\test\\parallel_fake_data.csv", ".\\test\\clean_fake_data.csv",
+                    chunksize = 2, workers = 2).clean_and_save()
+            actual = pd.read_csv(".\\test\\clean_fake_data.csv")
+            pd.testing.assert_frame_equal(actual, expected.reset_index(drop = True), check_dtype = False)
+            actual = Dataset(".\\test\\parallel_fake_data.csv", ".\\test\\clean_fake_data.csv",
+                             checkpoint_dir = ".\\test\\checkpoints", workers = 2).clean_and_save()
+            pd.testing.assert_frame_equal(actual, expected)
+        self.assertEqual(pool.call_count, 2)
+        
+    def test_clean_and_save_checkBounds_success(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", np.nan, "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        self.dataset_cleaner.data_pc = preclean_data
+        self.dataset_cleaner.clean_and_save()
+        min_val, max_val = load_bounds(".\\test\\clean_fake_data_bounds.json")
+        np.testing.assert_allclose(min_val, [10, -1, 1.1, 1.3, 10, 10, 0, -1, -1, -1, -1, -1], rtol = 1e-6)
+        np.testing.assert_allclose(max_val, [20, 1, 3.3, 2.6, 357, 357, 1, 4, 0, 1, 1, 0], rtol = 1e-6)
+        
+    def test_clean_and_save_npy_success(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", np.nan, "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        self.dataset_cleaner.data_pc = preclean_data
+        expected = self.dataset_cleaner.clean_and_save().reset_index(drop = True)
+        npy_cleaner = Dataset(".\\test\\fake_data.csv", ".\\test\\clean_fake_data.npy")
+        npy_cleaner.data_pc = preclean_data
+        npy_cleaner.clean_and_save()
+        actual = load_clean(".\\test\\clean_fake_data.npy")
+        actual = actual.loc[:,expected.columns]
+        #Should raise error
+        pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
+        #If above does not raise error, means they are equivalent. Hence Assert True
+        self.assertEqual(1,1)
+        
+    def test_clean_and_save_cache_success(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", np.nan, "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        preclean_data.to_csv(".\\test\\cache_fake_data.csv", index = False)
+        try:
+            cached_cleaner = Dataset(".\\test\\cache_fake_data.csv", ".\\test\\clean_fake_data.csv", 
+                                     cache_dir = ".\\test\\clean_cache")
+            expected = cached_cleaner.clean_and_save().reset_index(drop = True)
+            key = cached_cleaner.cache_key()
+            self.assertEqual(os.listdir(".\\test\\clean_cache"), [key])
+            #A hit must not clean again, so must not use the line-list
+            cached_cleaner.data_pc = None
+            with mock.patch.object(Dataset, "data_pc", new_callable = mock.PropertyMock,
+                                   side_effect = AssertionError("Read the line-list")):
+                actual = cached_cleaner.clean_and_save()
+            pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
+            #Changing the vocabulary invalidates the cache
+            vocabulary = dict(cached_cleaner.vocabulary)
+            vocabulary["diabetes"] = frozenset(["diabetes", "type 2 diabetes"])
+            cached_cleaner.vocabulary = vocabulary
+            self.assertNotEqual(cached_cleaner.cache_key(), key)
+        finally:
+            os.remove(".\\test\\cache_fake_data.csv")
+            shutil.rmtree(".\\test\\clean_cache", ignore_errors = True)
+        
+    def test_clean_and_save_cache_pruned(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", np.nan, "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        self.addCleanup(shutil.rmtree, ".\\test\\clean_cache", ignore_errors = True)
+        self.addCleanup(os.remove, ".\\test\\cache_fake_data.csv")
+        #Only the newest cache_size runs are kept
+        keys = []
+        for age in ["10", "11", "12"]:
+            test_case["age"][0] = age
+            pd.DataFrame(data = test_case).to_csv(".\\test\\cache_fake_data.csv", index = False)
+            cached_cleaner = Dataset(".\\test\\cache_fake_data.csv", ".\\test\\clean_fake_data.npy",
+                                     cache_dir = ".\\test\\clean_cache", cache_size = 2)
+            cached_cleaner.clean_and_save()
+            keys.append(cached_cleaner.cache_key())
+        self.assertEqual(sorted(os.listdir(".\\test\\clean_cache")), sorted(keys[1:]))
+        #A line-list without outcomes has no bounds, so is not cached
+        test_case["outcome"] = [np.nan] * 3
+        pd.DataFrame(data = test_case).to_csv(".\\test\\cache_fake_data.csv", index = False)
+        Dataset(".\\test\\cache_fake_data.csv", ".\\test\\clean_fake_data.npy", chunksize = 2,
+                cache_dir = ".\\test\\clean_cache", cache_size = 2).clean_and_save()
+        self.assertEqual(sorted(os.listdir(".\\test\\clean_cache")), sorted(keys[1:]))
+        
+    def test_clean_and_save_checkpoint_resume(self):
+        test_case = {"age": ["10", "15", "20"], 
+                     "sex": ["male", np.nan, "female"], 
+                     "latitude": [1.1, 2.2, 3.3], 
+                     "longitude": [1.3, 2.6, 1.3],
+                     "date_onset_symptoms": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019"],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan], 
+                     "chronic_disease": [np.nan, "COPD", "hypertension"],        
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019"], 
+                     "outcome": ["death","discharged","discharged"], 
+                     "admin1": ["True","False","False"]}
+        preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude", 
+                              "longitude", "date_onset_symptoms", 
+                              "date_admission_hospital", "symptoms", "chronic_disease", 
+                              "date_death_or_discharge", "outcome", "admin1"])
+        preclean_data.to_csv(".\\test\\checkpoint_fake_data.csv", index = False)
+        try:
+            resumed_cleaner = Dataset(".\\test\\checkpoint_fake_data.csv", ".\\test\\clean_fake_data.csv", 
+                                      checkpoint_dir = ".\\test\\checkpoints")
+            expected = resumed_cleaner.clean_and_save()
+            self.assertEqual(len(os.listdir(".\\test\\checkpoints")), len(Dataset.stages))
+            keys = resumed_cleaner.stage_keys()
+            #Editing a table the stages share invalidates all of them
+            with mock.patch.dict(age_ranges, {"30-39": "35"}):
+                new_keys = resumed_cleaner.stage_keys()
+            self.assertTrue(all(key != new_key for key, new_key in zip(keys, new_keys)))
+            #Editing the symptom vocabulary keeps the checkpoints before it
+            vocabulary = dict(resumed_cleaner.vocabulary)
+            symptom_tiers = dict(vocabulary["symptom_tiers"])
+            symptom_tiers["headache"] = 2
+            vocabulary["symptom_tiers"] = symptom_tiers
+            resumed_cleaner.vocabulary = vocabulary
+            new_keys = resumed_cleaner.stage_keys()
+            self.assertEqual(keys[:3], new_keys[:3])
+            self.assertNotEqual(keys[3], new_keys[3])
+            #So a rerun does not need the line-list
+            resumed_cleaner.data_pc = None
+            with mock.patch.object(Dataset, "data_pc", new_callable = mock.PropertyMock,
+                                   side_effect = AssertionError("Read the line-list")):
+                actual = resumed_cleaner.clean_and_save()
+            np.testing.assert_allclose(actual["symptoms"], [1, 0.6, 0], rtol = 1e-6)
+            pd.testing.assert_frame_equal(actual.drop(columns = "symptoms"), 
+                                          expected.drop(columns = "symptoms"))
+        finally:
+            os.remove(".\\test\\checkpoint_fake_data.csv")
+            shutil.rmtree(".\\test\\checkpoints", ignore_errors = True)
+        
     def test_correct_file_convention(self):
         file_exist = os.path.isfile("..\\latestdata.csv")
         if file_exist:
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the flattened Random Forest
+"""
+import os
+import shutil
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from src.forest import Forest
+from src.registry import save_model, load_model
+
+class TestForest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.rand(500, 4)
+        #Rounded, so many rows sit exactly on a threshold
+        self.x[:, 1] = np.round(self.x[:, 1], 1)
+        self.y = (self.x[:,0] + self.x[:,1] + 0.3 * rng.rand(500) > 1).astype(float)
+        self.model = RandomForestClassifier(n_estimators = 20, max_leaf_nodes = 50, min_samples_leaf = 3,
+                                            random_state = 0).fit(self.x, self.y)
+
+    def tearDown(self):
+        shutil.rmtree(".\\test\\models", ignore_errors = True)
+        for file in [".\\test\\forest.npz", ".\\test\\forest_fake_data.csv"]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_from_sklearn_predict_proba(self):
+        forest = Forest.from_sklearn(self.model)
+        x = np.vstack([self.x, np.random.RandomState(1).rand(500, 4) * 2 - 0.5])
+        np.testing.assert_array_equal(forest.predict_proba(x), self.model.predict_proba(x))
+        np.testing.assert_array_equal(forest.predict(x), self.model.predict(x))
+        #Splitting the rows between threads gives the same sums
+        np.testing.assert_array_equal(forest.predict_proba(x, n_jobs = 3), self.model.predict_proba(x))
+        np.testing.assert_array_equal(forest.predict_proba(x[:1], n_jobs = -1), self.model.predict_proba(x[:1]))
+        self.assertEqual(forest.threshold.dtype, np.float32)
+        self.assertEqual(forest.left.dtype, np.int32)
+
+    def test_thresholds(self):
+        #Rows at every threshold and the float32 values either side of it
+        forest = Forest.from_sklearn(self.model)
+        thresholds = np.concatenate([estimator.tree_.threshold for estimator in self.model.estimators_])
+        t = thresholds[thresholds != -2].astype(np.float32)
+        t = np.concatenate([t, np.nextafter(t, np.float32(np.inf)), np.nextafter(t, np.float32(-np.inf))])
+        x = np.tile(t[:, np.newaxis], (1, 4))
+        np.testing.assert_array_equal(forest.predict_proba(x), self.model.predict_proba(x))
+
+    def test_save_load(self):
+        forest = Forest.from_sklearn(self.model)
+        forest.save(".\\test\\forest.npz")
+        np.testing.assert_array_equal(Forest.load(".\\test\\forest.npz").predict_proba(self.x),
+                                      forest.predict_proba(self.x))
+        open(".\\test\\forest_fake_data.csv", "w").close()
+        save_model(forest, "rf_forest", "forest", ".\\test\\forest_fake_data.csv", registry = ".\\test\\models")
+        loaded = load_model("rf_forest", registry = ".\\test\\models").model
+        np.testing.assert_array_equal(loaded.predict_proba(self.x), self.model.predict_proba(self.x))
+        np.testing.assert_array_equal(loaded.classes_, self.model.classes_)
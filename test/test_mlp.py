@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the NumPy Neural Network
+"""
+import os
+import shutil
+import unittest
+import numpy as np
+from src.mlp import MLP
+from src.registry import save_model, load_model
+
+class DenseLayer:
+    #Has the methods of a Keras Dense layer which MLP.from_keras uses
+    def __init__(self, kernel, bias, activation):
+        self.weights = [kernel, bias]
+        self.activation = activation
+    def get_weights(self):
+        return self.weights
+    def get_config(self):
+        return {"activation": self.activation}
+
+class Sequential:
+    def __init__(self, layers):
+        self.layers = layers
+
+class TestMLP(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.layers = [DenseLayer(rng.randn(11, 8), rng.randn(8), "relu"),
+                       DenseLayer(rng.randn(8, 4), rng.randn(4), "relu"),
+                       DenseLayer(rng.randn(4, 1), rng.randn(1), "sigmoid")]
+        self.x = rng.rand(50, 11)
+
+    def tearDown(self):
+        shutil.rmtree(".\\test\\models", ignore_errors = True)
+        for file in [".\\test\\mlp.npz", ".\\test\\mlp_fake_data.csv"]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def expected(self):
+        a = self.x
+        for layer in self.layers:
+            kernel, bias = layer.get_weights()
+            a = a @ kernel + bias
+            a = np.maximum(a, 0) if layer.activation == "relu" else 1 / (1 + np.exp(-a))
+        return a
+
+    def test_from_keras_predict(self):
+        actual = MLP.from_keras(Sequential(self.layers)).predict(self.x)
+        self.assertEqual(actual.shape, (50, 1))
+        self.assertEqual(actual.dtype, np.float32)
+        np.testing.assert_allclose(actual, self.expected(), rtol = 1e-5, atol = 1e-6)
+
+    def test_save_load(self):
+        mlp = MLP.from_keras(Sequential(self.layers))
+        mlp.save(".\\test\\mlp.npz")
+        np.testing.assert_array_equal(MLP.load(".\\test\\mlp.npz").predict(self.x), mlp.predict(self.x))
+        open(".\\test\\mlp_fake_data.csv", "w").close()
+        save_model(mlp, "nn_mlp", "mlp", ".\\test\\mlp_fake_data.csv", registry = ".\\test\\models")
+        loaded = load_model("nn_mlp", registry = ".\\test\\models").model
+        np.testing.assert_array_equal(loaded.predict(self.x), mlp.predict(self.x))
+
+    def test_unknown_activation(self):
+        with self.assertRaises(ValueError):
+            MLP.from_keras(Sequential([DenseLayer(np.ones((2, 1)), np.ones(1), "softmax")]))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the streamed input of the Neural Network
+"""
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from src.clean_covid_dataset import feature_columns, save_clean
+from src.nn import stream_split, stream_features, row_blocks
+from src.resample import resampled_split
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.data = pd.DataFrame(rng.rand(200, len(feature_columns)).astype(np.float32), columns = feature_columns)
+        self.data["outcome"] = (rng.rand(200) < 0.2).astype(np.float32)
+        self.paths = [".\\test\\stream_fake_data.csv", ".\\test\\stream_fake_data.npy"]
+        for path in self.paths:
+            save_clean(self.data, path)
+
+    def tearDown(self):
+        for file in self.paths + [".\\test\\stream_fake_data_labels.npy"]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_stream_split(self):
+        for path in self.paths:
+            train_rows, val_rows, test_rows, labels = stream_split(path)
+            rows = np.concatenate([train_rows, val_rows, test_rows])
+            self.assertEqual(sorted(rows), list(range(200)))
+            np.testing.assert_array_equal(labels, self.data["outcome"])
+            #The same test rows as the resampled models
+            x_test = resampled_split(path, cache_dir = None)[1]
+            np.testing.assert_allclose(self.data.loc[test_rows, feature_columns].values, x_test.values)
+
+    def test_stream_features(self):
+        for path in self.paths:
+            x, directory = stream_features(path, 200)
+            np.testing.assert_allclose(x, self.data.loc[:,feature_columns].values)
+            self.assertEqual(directory is None, path.endswith(".npy"))
+
+    def test_row_blocks(self):
+        rows = np.arange(0, 100, 2)
+        #In file order without a random state
+        blocks = list(row_blocks(rows[::-1], 16))
+        np.testing.assert_array_equal(np.concatenate(blocks), rows)
+        #In a new order every pass with one
+        rng = np.random.RandomState(0)
+        passes = [np.concatenate(list(row_blocks(rows, 16, rng))) for i in range(2)]
+        for order in passes:
+            self.assertEqual(sorted(order), list(rows))
+            self.assertFalse(np.array_equal(order, rows))
+        self.assertFalse(np.array_equal(passes[0], passes[1]))
+        self.assertTrue(all(np.all(np.diff(block) > 0) for block in row_blocks(rows, 16, rng)))
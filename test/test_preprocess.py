@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the online preprocessing
+"""
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from src.clean_covid_dataset import Dataset, feature_columns, age_ranges, default_vocabulary
+from src.preprocess import Preprocessor
+
+class TestPreprocessor(unittest.TestCase):
+    def setUp(self):
+        test_case = {"age": ["50-59", "15", "20", np.nan],
+                     "sex": ["male", np.nan, "female", "male"],
+                     "latitude": [1.1, 2.2, 3.3, np.nan],
+                     "longitude": [1.3, 2.6, 1.3, 1.3],
+                     "date_onset_symptoms": ["-24.12.2019", "11.01.2019", "17.02.2019 - 19.02.2019", np.nan],
+                     "date_admission_hospital": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan],
+                     "symptoms": ["cough, acute respiratory failure", "headache", np.nan, "fever"],
+                     "chronic_disease": [np.nan, "COPD", "hypertension, diabetes", "asthma"],
+                     "date_death_or_discharge": ["24.12.2019", "11.01.2019", "17.02.2019", np.nan],
+                     "outcome": ["death","discharged","discharged", "death"],
+                     "admin1": ["True","False","False","False"]}
+        self.preclean_data = pd.DataFrame(data = test_case, columns = ["age", "sex", "latitude",
+                              "longitude", "date_onset_symptoms",
+                              "date_admission_hospital", "symptoms", "chronic_disease",
+                              "date_death_or_discharge", "outcome", "admin1"])
+        dataset_cleaner = Dataset(".\\test\\fake_data.csv", ".\\test\\clean_fake_data.csv")
+        dataset_cleaner.data_pc = self.preclean_data.copy()
+        self.clean_data = dataset_cleaner.clean_and_save()
+        self.preprocessor = Preprocessor(".\\test\\clean_fake_data.csv")
+
+    def tearDown(self):
+        for file in [".\\test\\clean_fake_data.csv", ".\\test\\clean_fake_data_bounds.json"]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_transform_batch_success(self):
+        actual = self.preprocessor.transform_batch(self.preclean_data.drop(columns = ["outcome"]))
+        expected = self.clean_data.loc[:,feature_columns].values
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_transform_record_success(self):
+        records = self.preclean_data.drop(columns = ["outcome"]).astype(object).to_dict("records")
+        actual = np.stack([self.preprocessor.transform_record(record) for record in records])
+        expected = self.clean_data.loc[:,feature_columns].values
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_transform_record_missing_fields(self):
+        #Fields which are not given are empty, i.e. -1 before scaling
+        actual = self.preprocessor.transform_record({"sex": "female"})
+        expected = self.preprocessor.transform_batch(pd.DataFrame({"sex": ["female"]}))[0]
+        np.testing.assert_array_equal(actual, expected)
+        self.assertEqual(actual.dtype, np.float32)
+
+    def test_transform_record_invalid(self):
+        with self.assertRaises(ValueError):
+            self.preprocessor.transform_record({"sex": "unknown"})
+        with self.assertRaises(ValueError):
+            self.preprocessor.transform_record({"symptoms": "not a symptom"})
+
+    def test_transform_record_full_vocabulary(self):
+        #Every entry of the vocabulary and every age range is encoded the same way on both paths
+        vocabulary = default_vocabulary
+        #Synonyms of a symptom which is neither in a tier nor an outlier are invalid
+        synonyms = [name for name, symptom in vocabulary["symptom_synonyms"].items()
+                    if symptom in vocabulary["symptom_tiers"] or symptom in vocabulary["symptom_outliers"]]
+        invalid = [name for name in vocabulary["symptom_synonyms"] if name not in synonyms]
+        symptoms = list(vocabulary["symptom_tiers"]) + synonyms + list(vocabulary["symptom_outliers"])
+        chronic = (list(vocabulary["chronic_synonyms"]) + list(vocabulary["chronic_outliers"])
+                   + sorted(vocabulary["diabetes"] | vocabulary["hypertension"] | vocabulary["severe_underlying"])
+                   + ["asthma"])
+        #Mixed entries, split on each of the separators
+        symptoms += ["fever; " + name for name in synonyms] + [np.nan]
+        chronic += ["diabetes: " + name for name in vocabulary["chronic_synonyms"]] + [np.nan]
+        ages = list(age_ranges) + ["15", np.nan]
+        n = max(len(symptoms), len(chronic), len(ages))
+        records = pd.DataFrame({"age": [ages[i % len(ages)] for i in range(n)],
+                                "sex": [["male", "female", np.nan][i % 3] for i in range(n)],
+                                "latitude": [[1.1, 2.2, np.nan][i % 3] for i in range(n)],
+                                "longitude": [1.3] * n,
+                                "date_onset_symptoms": [["-24.12.2019", "17.02.2019 - 19.02.2019", np.nan][i % 3] for i in range(n)],
+                                "date_admission_hospital": [["24.12.2019", np.nan][i % 2] for i in range(n)],
+                                "symptoms": [symptoms[i % len(symptoms)] for i in range(n)],
+                                "chronic_disease": [chronic[i % len(chronic)] for i in range(n)]})
+        expected = self.preprocessor.transform_batch(records)
+        actual = np.stack([self.preprocessor.transform_record(record)
+                           for record in records.astype(object).to_dict("records")])
+        np.testing.assert_array_equal(actual, expected)
+        #Both paths reject the same entries
+        for field, value in [("sex", "unknown"), ("symptoms", "not a symptom"),
+                             ("symptoms", "fever, not a symptom"), ("date_admission_hospital", "31.12.2018")] \
+                            + [("symptoms", name) for name in invalid]:
+            with self.assertRaises(ValueError):
+                self.preprocessor.transform_batch(pd.DataFrame({field: [value]}))
+            with self.assertRaises(ValueError):
+                self.preprocessor.transform_record({field: value})
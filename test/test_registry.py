@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the model registry
+"""
+import os
+import shutil
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.clean_covid_dataset import clean_columns, save_bounds, bounds_path
+from src.registry import save_model, load_model, list_versions
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ".\\test\\models"
+        self.data_path = ".\\test\\registry_fake_data.csv"
+        rng = np.random.RandomState(0)
+        self.x = rng.rand(50, 3)
+        self.y = (self.x[:,0] > 0.5).astype(int)
+        pd.DataFrame(self.x).assign(outcome = self.y).to_csv(self.data_path, index = False)
+        save_bounds(bounds_path(self.data_path), (np.zeros(len(clean_columns)), np.ones(len(clean_columns))))
+        self.model = RandomForestClassifier(n_estimators = 5, max_depth = 3, random_state = 0).fit(self.x, self.y)
+
+    def tearDown(self):
+        shutil.rmtree(self.registry, ignore_errors = True)
+        for file in [self.data_path, bounds_path(self.data_path)]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_save_model_versions(self):
+        self.assertEqual(list_versions("rf", self.registry), [])
+        self.assertEqual(save_model(self.model, "rf", "sklearn", self.data_path, registry = self.registry), 1)
+        self.assertEqual(save_model(self.model, "rf", "sklearn", self.data_path, registry = self.registry), 2)
+        self.assertEqual(list_versions("rf", self.registry), [1, 2])
+        self.assertEqual(load_model("rf", registry = self.registry).version, 2)
+        self.assertEqual(load_model("rf", 1, registry = self.registry).version, 1)
+
+    def test_save_model_metadata(self):
+        save_model(self.model, "rf", "sklearn", self.data_path, metrics = {"accuracy": np.float64(0.5)},
+                   registry = self.registry)
+        saved = load_model("rf", registry = self.registry)
+        self.assertEqual(saved.metadata["hyperparameters"]["max_depth"], 3)
+        self.assertEqual(saved.metadata["metrics"], {"accuracy": 0.5})
+        self.assertTrue(saved.check_data(self.data_path))
+        np.testing.assert_array_equal(saved.bounds[1], np.ones(len(clean_columns), dtype = np.float32))
+
+    def test_load_model_lazy(self):
+        save_model(self.model, "rf", "sklearn", self.data_path, registry = self.registry)
+        saved = load_model("rf", registry = self.registry)
+        self.assertIsNone(saved._RegisteredModel__model)
+        np.testing.assert_array_equal(saved.model.predict_proba(self.x), self.model.predict_proba(self.x))
+
+    def test_load_model_missing(self):
+        with self.assertRaises(FileNotFoundError):
+            load_model("svm", registry = self.registry)
+        with self.assertRaises(ValueError):
+            save_model(self.model, "rf", "pickle", self.data_path, registry = self.registry)
+
+    def test_load_model_compressed(self):
+        save_model(self.model, "rf", "sklearn", self.data_path, compress = 3, registry = self.registry)
+        saved = load_model("rf", registry = self.registry)
+        self.assertEqual(saved.metadata["compress"], 3)
+        #Read in without trying to memory map it
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            model = saved.model
+        np.testing.assert_array_equal(model.predict_proba(self.x), self.model.predict_proba(self.x))
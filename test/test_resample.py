@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the shared resampling
+"""
+import os
+import shutil
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from imblearn.combine import SMOTEENN
+from sklearn.neighbors import NearestNeighbors
+from src.clean_covid_dataset import feature_columns
+from src.resample import resampled_split, resample_key, Resampler
+
+class PlainIndex:
+    #Only has fit and kneighbors, like an approximate index
+    def __init__(self, n_neighbors):
+        self.index = NearestNeighbors(n_neighbors = n_neighbors)
+    def fit(self, x):
+        self.index.fit(x)
+        return self
+    def kneighbors(self, x, n_neighbors = None, return_distance = True):
+        return self.index.kneighbors(x, n_neighbors, return_distance)
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = ".\\test\\resample_cache"
+        self.data_path = ".\\test\\resample_fake_data.csv"
+        rng = np.random.RandomState(0)
+        data = pd.DataFrame(rng.rand(200, len(feature_columns)), columns = feature_columns)
+        data["outcome"] = (rng.rand(200) < 0.2).astype(float)
+        data.to_csv(self.data_path, index = False)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors = True)
+        if os.path.isfile(self.data_path):
+            os.remove(self.data_path)
+
+    def test_resampled_split_cached(self):
+        expected = resampled_split(self.data_path, cache_dir = self.cache_dir)
+        self.assertEqual(os.listdir(self.cache_dir), [resample_key(self.data_path) + ".npz"])
+        actual = resampled_split(self.data_path, cache_dir = self.cache_dir)
+        for i in range(4):
+            np.testing.assert_array_equal(np.asarray(actual[i]), np.asarray(expected[i]))
+        self.assertEqual(list(actual[0].columns), feature_columns)
+        self.assertEqual(len(actual[1]), 30)
+
+    def test_resampled_split_seeded(self):
+        #Same seed, same resampling without the cache
+        expected = resampled_split(self.data_path, cache_dir = None)
+        actual = resampled_split(self.data_path, cache_dir = None)
+        np.testing.assert_array_equal(actual[0].values, expected[0].values)
+        self.assertNotEqual(resample_key(self.data_path, seed = 1), resample_key(self.data_path))
+        self.assertNotEqual(resample_key(self.data_path, test_size = 0.33), resample_key(self.data_path))
+
+    def test_resampler_default_smoteenn(self):
+        data = pd.read_csv(self.data_path)
+        y = data.pop("outcome")
+        expected = SMOTEENN(random_state = 0).fit_resample(data, y)
+        for algorithm in ["auto", "kd_tree", lambda n: NearestNeighbors(n_neighbors = n), PlainIndex]:
+            actual = Resampler(n_jobs = 2, algorithm = algorithm).fit_resample(data, y)
+            np.testing.assert_array_equal(actual[0].values, expected[0].values)
+            np.testing.assert_array_equal(actual[1].values, expected[1].values)
+        with self.assertRaises(ValueError):
+            Resampler(algorithm = "hnsw")
+
+    def test_resampler_n_jobs(self):
+        #Both neighbour searches run on n_jobs cores
+        data = pd.read_csv(self.data_path)
+        y = data.pop("outcome")
+        with mock.patch.object(SMOTEENN, "fit_resample", autospec = True,
+                               side_effect = SMOTEENN.fit_resample) as fit_resample:
+            Resampler(n_jobs = 2).fit_resample(data, y)
+        smoteenn = fit_resample.call_args[0][0]
+        self.assertEqual(smoteenn.smote_.nn_k_.n_jobs, 2)
+        self.assertEqual(smoteenn.enn_.nn_.n_jobs, 2)
+
+    def test_resampler_callable_key(self):
+        #A callable is only cached under a key naming it
+        self.assertIsNone(resample_key(self.data_path, resampler = Resampler(algorithm = PlainIndex)))
+        resampled_split(self.data_path, cache_dir = self.cache_dir, resampler = Resampler(algorithm = PlainIndex))
+        self.assertFalse(os.path.isdir(self.cache_dir))
+        keys = [resample_key(self.data_path, resampler = Resampler(algorithm = lambda n: PlainIndex(n),
+                                                                   algorithm_key = name))
+                for name in ["exact", "approximate"]]
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_resampler_max_majority(self):
+        data = pd.read_csv(self.data_path)
+        y = data.pop("outcome")
+        actual = Resampler(max_majority = 100).fit_resample(data, y)
+        self.assertLessEqual((actual[1] == 0).sum(), 100)
+        self.assertNotEqual(resample_key(self.data_path, resampler = Resampler(max_majority = 100)),
+                            resample_key(self.data_path))
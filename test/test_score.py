@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the evaluation runner
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+from src.score import score
+from test.fake_models import register_fake_models, remove_fake_models
+
+class TestScore(unittest.TestCase):
+    def setUp(self):
+        self.registry = ".\\test\\models"
+        self.data_path = ".\\test\\score_fake_data.csv"
+        register_fake_models(self.registry, self.data_path)
+
+    def tearDown(self):
+        remove_fake_models(self.registry, self.data_path)
+        for file in [".\\test\\results.json", ".\\test\\results.csv", ".\\test\\roc.png"]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def test_score_report(self):
+        results = score(self.data_path, ["svm", "rf", "nn"], report_path = ".\\test\\results",
+                        plot_path = ".\\test\\roc.png", registry = self.registry)
+        #nn was never registered, so is skipped
+        self.assertEqual([result["name"] for result in results], ["svm", "rf"])
+        with open(".\\test\\results.json") as f:
+            report = json.load(f)
+        self.assertEqual(report["test_samples"], 30)
+        self.assertEqual(report["models"][1]["name"], "rf")
+        self.assertTrue(report["models"][1]["trained_on_this_data"])
+        self.assertEqual(np.sum(report["models"][1]["confusion_matrix"]), 30)
+        table = pd.read_csv(".\\test\\results.csv")
+        self.assertEqual(list(table.columns), ["model", "version", "accuracy", "precision", "recall", "roc_auc"])
+        self.assertAlmostEqual(table.loc[1, "roc_auc"], results[1]["roc_auc"])
+        self.assertTrue(os.path.isfile(".\\test\\roc.png"))
+
+    def test_score_import_light(self):
+        #The service and the batch scorer must not load matplotlib to start
+        code = "import sys, src.serve, src.batch_score, src.score; print('matplotlib' in sys.modules)"
+        actual = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True)
+        self.assertEqual(actual.stdout.strip(), "False")
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the scoring engine
+"""
+import unittest
+import numpy as np
+from sklearn import metrics, svm
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
+from src.scoring import model_outputs, evaluate_model, confusion_matrix
+
+class ProbabilityModel:
+    #Outputs the probability of death from predict, like the Neural Network
+    def predict(self, x, batch_size = None):
+        return x[:,:1]
+
+class KerasModel(ProbabilityModel):
+    #Keras models of TensorFlow 2.4 also have a deprecated predict_proba, of shape (n, 1)
+    def predict_proba(self, x, batch_size = None):
+        return x[:,:1]
+
+class TestScoring(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.rand(300, 3)
+        self.y = (self.x[:,0] + 0.3 * rng.rand(300) > 0.6).astype(float)
+        self.models = [RandomForestClassifier(n_estimators = 10, random_state = 0).fit(self.x, self.y),
+                       svm.SVC(C = 10, gamma = 1).fit(self.x, self.y),
+                       Pipeline([("kernel", Nystroem(n_components = 20, random_state = 0)),
+                                 ("svm", svm.LinearSVC(dual = False))]).fit(self.x, self.y)]
+
+    def test_model_outputs_predict(self):
+        for model in self.models:
+            scores, y_pred = model_outputs(model, self.x, batch_size = 64)
+            np.testing.assert_array_equal(y_pred, model.predict(self.x))
+            self.assertEqual(scores.shape, (300,))
+        for model in [ProbabilityModel(), KerasModel()]:
+            scores, y_pred = model_outputs(model, self.x, batch_size = 64)
+            np.testing.assert_array_equal(scores, self.x[:,0])
+            np.testing.assert_array_equal(y_pred, (self.x[:,0] >= 0.5).astype(int))
+
+    def test_evaluate_model_metrics(self):
+        for model in self.models:
+            y_pred = model.predict(self.x)
+            actual = evaluate_model(model, self.x, self.y)
+            self.assertAlmostEqual(actual["accuracy"], metrics.accuracy_score(self.y, y_pred))
+            self.assertAlmostEqual(actual["precision"], metrics.precision_score(self.y, y_pred))
+            self.assertAlmostEqual(actual["recall"], metrics.recall_score(self.y, y_pred))
+            np.testing.assert_array_equal(actual["confusion_matrix"], metrics.confusion_matrix(self.y, y_pred))
+        #ROC AUC is computed on the scores
+        actual = evaluate_model(self.models[0], self.x, self.y)
+        expected = metrics.roc_auc_score(self.y, self.models[0].predict_proba(self.x)[:,1])
+        self.assertAlmostEqual(actual["roc_auc"], expected)
+
+    def test_confusion_matrix_no_positives(self):
+        actual = confusion_matrix(np.array([0, 0, 1]), np.array([0, 0, 0]))
+        np.testing.assert_array_equal(actual, [[2, 0], [1, 0]])
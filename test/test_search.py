@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the hyperparameter searches
+"""
+import unittest
+import numpy as np
+from sklearn import model_selection
+from sklearn.ensemble import RandomForestClassifier
+from src.search import make_search
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.rand(120, 3)
+        self.y = (self.x[:,0] > 0.5).astype(int)
+        self.model_rf = RandomForestClassifier(n_estimators = 5, random_state = 0)
+        self.search_field = dict(max_depth = [1, 2, 4], min_samples_leaf = [1, 5])
+
+    def test_make_search_types(self):
+        self.assertIsInstance(make_search(self.model_rf, self.search_field, "grid"), 
+                              model_selection.GridSearchCV)
+        self.assertIsInstance(make_search(self.model_rf, self.search_field, "halving"), 
+                              model_selection.HalvingGridSearchCV)
+        actual = make_search(self.model_rf, self.search_field, "random", budget = 3)
+        self.assertIsInstance(actual, model_selection.RandomizedSearchCV)
+        self.assertEqual(actual.n_iter, 3)
+        with self.assertRaises(ValueError):
+            make_search(self.model_rf, self.search_field, "bayes")
+
+    def test_make_search_fit(self):
+        #Samples for halving, candidates for random
+        for search, budget in [("grid", None), ("halving", 100), ("random", 4)]:
+            model = make_search(self.model_rf, self.search_field, search, budget, n_jobs = 2, verbose = 0)
+            model = model.fit(self.x, self.y)
+            self.assertIn(model.best_params_["max_depth"], [1, 2, 4])
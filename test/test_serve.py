@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the prediction service
+"""
+import http.client
+import json
+import threading
+import unittest
+from unittest import mock
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.serve import MicroBatcher, RiskService, make_server
+from test.fake_models import register_fake_models, remove_fake_models
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        self.registry = ".\\test\\models"
+        self.data_path = ".\\test\\serve_fake_data.csv"
+        self.rf, self.svm = register_fake_models(self.registry, self.data_path)
+        self.record = {"age": "50-59", "sex": "male", "latitude": 30.5, "longitude": 114.3,
+                       "symptoms": "cough, fever", "chronic_disease": "hypertension"}
+
+    def tearDown(self):
+        remove_fake_models(self.registry, self.data_path)
+
+    def test_micro_batcher_coalesces(self):
+        sizes = []
+        def predict(rows):
+            sizes.append(len(rows))
+            return rows.sum(axis = 1).tolist()
+        batcher = MicroBatcher(predict, max_batch_size = 4, max_latency = 0.5)
+        futures = [batcher.submit(np.full(2, i)) for i in range(6)]
+        self.assertEqual([future.result() for future in futures], [2 * i for i in range(6)])
+        batcher.close()
+        self.assertEqual(sizes, [4, 2])
+
+    def test_service_predict(self):
+        service = RiskService(["svm", "rf", "nn"], self.data_path, registry = self.registry)
+        try:
+            self.assertEqual(list(service.models), ["svm", "rf"])
+            actual = service.score_records([self.record, {}])
+            x = np.stack([service.preprocessor.transform_record(self.record),
+                          service.preprocessor.transform_record({})])
+            np.testing.assert_allclose([result["rf"]["probability"] for result in actual],
+                                       self.rf.predict_proba(x)[:,1])
+            self.assertIsNone(actual[0]["svm"]["probability"])
+            self.assertIn(actual[0]["svm"]["prediction"], [0, 1])
+        finally:
+            service.close()
+
+    def test_server_concurrent_requests(self):
+        service = RiskService(["rf"], self.data_path, registry = self.registry, max_latency = 0.05)
+        server = make_server(service, port = 0)
+        thread = threading.Thread(target = server.serve_forever, daemon = True)
+        thread.start()
+        url = "http://127.0.0.1:" + str(server.server_address[1])
+        def post(body):
+            request = urllib.request.Request(url + "/predict", data = json.dumps(body).encode("utf-8"),
+                                             headers = {"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                return json.load(response)
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                responses = list(executor.map(post, [self.record] * 7 + [{"records": [self.record, {}]}]))
+            expected = service.score_records([self.record])[0]
+            for response in responses[:7]:
+                self.assertEqual(response["predictions"], [expected])
+            self.assertEqual(len(responses[7]["predictions"]), 2)
+            with urllib.request.urlopen(url + "/health") as response:
+                self.assertEqual(json.load(response)["models"], [{"name": "rf", "version": 1}])
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                post({"sex": "unknown"})
+            self.assertEqual(error.exception.code, 400)
+            #A failing model is answered with a 500, not a dropped connection
+            with mock.patch.object(service, "score_records", side_effect = KeyError("rf")):
+                with self.assertRaises(urllib.error.HTTPError) as error:
+                    post(self.record)
+            self.assertEqual(error.exception.code, 500)
+            self.assertEqual(json.load(error.exception)["error"], "KeyError('rf')")
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+    def test_server_content_length(self):
+        service = RiskService(["rf"], self.data_path, registry = self.registry)
+        server = make_server(service, port = 0)
+        thread = threading.Thread(target = server.serve_forever, daemon = True)
+        thread.start()
+        def post(length):
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout = 5)
+            try:
+                connection.putrequest("POST", "/predict")
+                if length is not None:
+                    connection.putheader("Content-Length", length)
+                connection.endheaders()
+                response = connection.getresponse()
+                return response.status, json.load(response)
+            finally:
+                connection.close()
+        try:
+            #Answered at once, rather than dropped or left waiting for a body
+            self.assertEqual(post("abc")[0], 400)
+            self.assertEqual(post("-1")[0], 400)
+            self.assertEqual(post(None)[0], 411)
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
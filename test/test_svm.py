@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Test Class for the SVM modes
+"""
+import unittest
+import numpy as np
+from src.search import make_search
+from src.svm import make_svm
+
+class TestSVM(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.rand(120, 3)
+        self.y = (self.x[:,0] > 0.5).astype(int)
+
+    def test_make_svm_search(self):
+        #Every mode is searched through the names of its C and gamma
+        for svm_mode in ["exact", "nystroem", "subsample"]:
+            model_svm, search_names = make_svm(svm_mode, C = 1, gamma = 1)
+            search_field = {search_names["gamma"]: [0.1, 1], search_names["C"]: [1, 10]}
+            model = make_search(model_svm, search_field, "grid", n_jobs = 2, verbose = 0)
+            model = model.fit(self.x, self.y)
+            self.assertEqual(sorted(model.best_params_), sorted(search_names.values()))
+            self.assertGreater(model.best_estimator_.score(self.x, self.y), 0.8)
+        with self.assertRaises(ValueError):
+            make_svm("linear", C = 1, gamma = 1)